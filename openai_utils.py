@@ -1,73 +1,474 @@
+import asyncio
+import contextlib
+import email.utils
+import functools
+import importlib.util
+import itertools
+import json
+import os
+import random
+import re
+import shutil
 import subprocess
 import time
 import warnings
 import tempfile
 import threading
 from pathlib import Path
-from typing import Optional, Tuple
-
-# Suppress urllib3 warning about unsupported SSL implementations
-warnings.filterwarnings(
-    "ignore",
-    message="urllib3 v2 only supports OpenSSL",
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
 )
 
-# Directory for preserving Codex outputs
+# Directory for preserving Codex outputs. It is created on first use (see
+# :func:`ensure_dir`) rather than on import.
 GENERATED_DIR = Path("generated")
-GENERATED_DIR.mkdir(parents=True, exist_ok=True)
 
-try:
-    from openai import (
-        APIConnectionError,
-        APITimeoutError,
-        APIStatusError,
-        OpenAI,
-        OpenAIError,
-    )
-    try:
-        from openai.types.responses import WebSearchTool
-    except Exception:  # pragma: no cover - best-effort import for optional dependency
-        WebSearchTool = None  # type: ignore[assignment]
-except ModuleNotFoundError:
-    OpenAI = None  # type: ignore[assignment]
+# The openai SDK (and requests) are imported on first use rather than at module
+# import: openai pulls in a few hundred modules, which dominates start-up for
+# callers that only run Codex steps.
+_OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+
+
+class _MissingOpenAIError(Exception):
+    """Fallback error type when the openai package is unavailable."""
+
+
+class _RequestsFallback:
+    class exceptions:  # type: ignore[no-redef]
+        class RequestException(Exception):
+            """Fallback RequestException when requests is unavailable."""
 
-    class _MissingOpenAIError(Exception):
-        """Fallback error type when the openai package is unavailable."""
 
-    APIConnectionError = APITimeoutError = APIStatusError = OpenAIError = _MissingOpenAIError  # type: ignore[assignment]
-    WebSearchTool = None  # type: ignore[assignment]
-    _OPENAI_AVAILABLE = False
-else:
-    _OPENAI_AVAILABLE = True
+def _importer(module_name: str, attr: Optional[str], fallback: Any) -> Callable[[], Any]:
+    """Return a factory importing ``module_name`` (or one of its attributes)."""
+
+    def load() -> Any:
+        if module_name.split(".")[0] == "openai" and not _OPENAI_AVAILABLE:
+            return fallback
+        # urllib3 warns about unsupported SSL implementations at import time;
+        # silence it for this import only rather than process-wide.
+        with warnings.catch_warnings():
+            warnings.filterwarnings(
+                "ignore", message="urllib3 v2 only supports OpenSSL"
+            )
+            try:
+                module = importlib.import_module(module_name)
+                return module if attr is None else getattr(module, attr)
+            except (ImportError, AttributeError):
+                return fallback
+
+    return load
+
+
+@functools.lru_cache(maxsize=None)
+def ensure_dir(path: Path) -> Path:
+    """Create ``path`` (and parents) once per process and return it."""
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
 
 try:
-    import requests
+    import orjson
 except ModuleNotFoundError:
-    class _RequestsFallback:
-        class exceptions:  # type: ignore[no-redef]
-            class RequestException(Exception):
-                """Fallback RequestException when requests is unavailable."""
+    orjson = None  # type: ignore[assignment]
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialise ``obj`` to compact UTF-8 JSON, using ``orjson`` when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
-    requests = _RequestsFallback()  # type: ignore[assignment]
+
+# 19 digits is the shortest integer that can fall outside the 64-bit range.
+# Some orjson releases return such integers as floats instead of raising, so
+# documents containing one are parsed by the stdlib, which keeps them exact.
+_WIDE_DIGITS = re.compile(r"[0-9]{19}")
+_WIDE_DIGITS_BYTES = re.compile(rb"[0-9]{19}")
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON text or UTF-8 bytes, using ``orjson`` when installed.
+
+    Documents with a run of 19 or more digits go straight to
+    :func:`json.loads`, so integers wider than 64 bits are never rounded to
+    floats. Input ``orjson`` rejects but the stdlib accepts (``NaN``,
+    ``Infinity``) is also handed to :func:`json.loads`, which supplies the
+    error message for invalid documents. Malformed input raises a
+    ``ValueError`` subclass either way.
+    """
+    if orjson is not None:
+        wide = _WIDE_DIGITS if isinstance(data, str) else _WIDE_DIGITS_BYTES
+        if wide.search(data) is None:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(data)
 
 
 class CodexTimeoutError(Exception):
     """Custom exception for codex CLI timeouts."""
 
 
-client = None
-if _OPENAI_AVAILABLE:
+class OpenAIBatchError(Exception):
+    """Raised when an OpenAI Batch API job or one of its requests fails."""
+
+
+# Connection pool shared by every request made through one client. The
+# openai default keeps only a handful of idle connections, which turns into a
+# TLS handshake per request once the batch helpers run many calls at once.
+HTTP_POOL_SIZE = 64
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _http_client_kwargs() -> Dict[str, Any]:
+    """Return ``httpx`` client options for a large, long-lived connection pool.
+
+    HTTP/2 is enabled only when the optional ``h2`` package is installed.
+    """
+    httpx = _lazy("httpx")
+    kwargs: Dict[str, Any] = {
+        "limits": httpx.Limits(
+            max_connections=HTTP_POOL_SIZE,
+            max_keepalive_connections=HTTP_POOL_SIZE,
+            keepalive_expiry=60,
+        ),
+        # Keep the openai read timeout (long reasoning responses) but fail
+        # fast when a connection cannot be established.
+        "timeout": httpx.Timeout(600.0, connect=5.0),
+    }
+    if _HTTP2_AVAILABLE:
+        kwargs["http2"] = True
+    return kwargs
+
+
+def _new_async_client() -> Any:
+    """Create an :class:`openai.AsyncOpenAI` client with the shared pool settings."""
+    async_openai = _lazy("AsyncOpenAI")
+    httpx = _lazy("httpx")
+    if httpx is None:
+        return async_openai()
+    return async_openai(http_client=httpx.AsyncClient(**_http_client_kwargs()))
+
+
+def _create_client() -> Any:
+    """Build the shared synchronous client, or ``None`` if it cannot be configured."""
+    if not _OPENAI_AVAILABLE:
+        return None
+    openai_cls = _lazy("OpenAI")
+    httpx = _lazy("httpx")
+    try:
+        if httpx is None:
+            return openai_cls()
+        return openai_cls(http_client=httpx.Client(**_http_client_kwargs()))
+    except _lazy("OpenAIError"):
+        return None
+
+
+def _network_exceptions() -> Tuple[Type[BaseException], ...]:
+    """Return the exception types treated as transient network failures."""
+    request_exception = _lazy("requests").exceptions.RequestException
+    if not _OPENAI_AVAILABLE:
+        return (request_exception,)
+    return (
+        request_exception,
+        _lazy("APIConnectionError"),
+        _lazy("APITimeoutError"),
+        _lazy("APIStatusError"),
+    )
+
+
+# Module attributes that are created on first access, either through
+# :func:`_lazy` inside this module or as ``openai_utils.<name>`` from outside.
+# Assigning one of them (for example ``openai_utils.client`` in tests) takes
+# precedence over the factory.
+_LAZY_FACTORIES: Dict[str, Callable[[], Any]] = {
+    "OpenAI": _importer("openai", "OpenAI", None),
+    "AsyncOpenAI": _importer("openai", "AsyncOpenAI", None),
+    "OpenAIError": _importer("openai", "OpenAIError", _MissingOpenAIError),
+    "APIConnectionError": _importer("openai", "APIConnectionError", _MissingOpenAIError),
+    "APITimeoutError": _importer("openai", "APITimeoutError", _MissingOpenAIError),
+    "APIStatusError": _importer("openai", "APIStatusError", _MissingOpenAIError),
+    "WebSearchTool": _importer("openai.types.responses", "WebSearchTool", None),
+    "httpx": _importer("httpx", None, None),
+    "requests": _importer("requests", None, _RequestsFallback()),
+    "client": _create_client,
+    "NETWORK_EXCEPTIONS": _network_exceptions,
+}
+_LAZY_LOCK = threading.RLock()
+
+
+def _lazy(name: str) -> Any:
+    """Return the lazily created module attribute ``name``."""
+    namespace = globals()
+    try:
+        return namespace[name]
+    except KeyError:
+        pass
+    with _LAZY_LOCK:
+        if name not in namespace:
+            namespace[name] = _LAZY_FACTORIES[name]()
+        return namespace[name]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_FACTORIES:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+T = TypeVar("T")
+
+
+def _backoff_delay(
+    attempt: int,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    jitter: float = 0.5,
+) -> float:
+    """Return the sleep duration before retrying after ``attempt`` failures.
+
+    The delay grows exponentially (``backoff_factor * 2**attempt``), is capped at
+    ``max_backoff`` and is then stretched by a random factor of up to ``jitter``
+    so that concurrent callers do not retry in lockstep.
+    """
+    delay = min(max_backoff, backoff_factor * (2 ** attempt))
+    return delay * (1 + random.uniform(0, jitter))
+
+
+class RateLimiter:
+    """Client-side token bucket for requests-per-minute and tokens-per-minute.
+
+    Keeping request volume just under the account limits avoids spending
+    requests on 429 responses and the backoff that follows. Each call to
+    :meth:`acquire` reserves one request and ``tokens`` tokens. If a bucket
+    would go negative, the caller sleeps until that bucket has refilled
+    enough. Reservations are made under a lock and the sleep happens outside
+    it, so the limiter is safe to share between threads. :meth:`acquire_async`
+    gives the same guarantee to coroutines.
+
+    Args:
+        rpm: Maximum requests per minute, or ``None`` for no request limit.
+        tpm: Maximum tokens per minute, or ``None`` for no token limit.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None) -> None:
+        for name, limit in (("rpm", rpm), ("tpm", tpm)):
+            if limit is not None and limit <= 0:
+                raise ValueError(f"{name} must be positive")
+        # Each bucket is [capacity, level, refill rate per second]; buckets
+        # start full so the first minute can burst up to the limit.
+        self._buckets = [
+            [float(limit), float(limit), limit / 60.0] if limit is not None else None
+            for limit in (rpm, tpm)
+        ]
+        self._lock = threading.Lock()
+        self._last = time.monotonic()
+
+    def _reserve(self, tokens: int) -> float:
+        """Consume one request and ``tokens`` tokens; return the required wait."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last
+            self._last = now
+            wait = 0.0
+            for bucket, cost in zip(self._buckets, (1, tokens)):
+                if bucket is None:
+                    continue
+                capacity, level, rate = bucket
+                level = min(capacity, level + rate * elapsed) - cost
+                bucket[1] = level
+                if level < 0:
+                    wait = max(wait, -level / rate)
+            return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Block until a request costing ``tokens`` tokens may be sent."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        """Asynchronous counterpart of :meth:`acquire`."""
+        delay = self._reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _estimate_tokens(prompt: str) -> int:
+    """Cheaply approximate the prompt's token count (about four chars per token)."""
+    return max(1, len(prompt) // 4)
+
+
+def _is_retryable_api_error(exc: BaseException) -> bool:
+    """Return whether an OpenAI/network error is worth retrying.
+
+    HTTP status errors are retried only for rate limits (429) and server
+    errors (5xx); other 4xx responses will not succeed on a second attempt.
+    Connection errors and timeouts are always retryable.
+    """
+    if _OPENAI_AVAILABLE and isinstance(exc, _lazy("APIStatusError")):
+        status = getattr(exc, "status_code", None)
+        return status == 429 or (status is not None and 500 <= status < 600)
+    return True
+
+
+def _retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Extract the server-requested delay from a ``Retry-After`` header, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
     try:
-        client = OpenAI()
-    except OpenAIError:
-        client = None
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _next_delay(
+    exc: BaseException,
+    attempt: int,
+    retry_after: Optional[Callable[[BaseException], Optional[float]]],
+    backoff_factor: float,
+    max_backoff: float,
+    jitter: float,
+) -> float:
+    """Return the backoff delay, raised to any minimum requested by the server."""
+    delay = _backoff_delay(
+        attempt,
+        backoff_factor=backoff_factor,
+        max_backoff=max_backoff,
+        jitter=jitter,
+    )
+    if retry_after is not None:
+        requested = retry_after(exc)
+        if requested is not None:
+            delay = max(delay, requested)
+    return delay
+
+
+def _retry(
+    fn: Callable[[], T],
+    exceptions: Union[Type[BaseException], Tuple[Type[BaseException], ...]],
+    max_retries: int = 3,
+    *,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    jitter: float = 0.5,
+    retry_if: Optional[Callable[[BaseException], bool]] = None,
+    retry_after: Optional[Callable[[BaseException], Optional[float]]] = None,
+    deadline: Optional[float] = None,
+) -> T:
+    """Call ``fn`` until it succeeds, retrying on ``exceptions``.
+
+    Retries sleep for an exponentially increasing, jittered delay computed by
+    :func:`_backoff_delay`. The exception from the final attempt is re-raised,
+    and any exception not listed in ``exceptions`` propagates immediately.
+
+    ``retry_if`` can further narrow which of the listed exceptions are
+    retried, and ``retry_after`` may return a minimum delay for a given
+    exception (for example from a ``Retry-After`` header).
+
+    ``deadline`` bounds the total time in seconds spent across attempts:
+    once it has elapsed the latest exception is re-raised regardless of
+    ``max_retries``, and backoff sleeps never extend past it.
+    """
+    start = time.monotonic()
+    for attempt in range(max_retries):
+        try:
+            return fn()
+        except exceptions as exc:
+            if attempt == max_retries - 1:
+                raise
+            if retry_if is not None and not retry_if(exc):
+                raise
+            delay = _next_delay(
+                exc, attempt, retry_after, backoff_factor, max_backoff, jitter
+            )
+            if deadline is not None:
+                remaining = deadline - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise
+                delay = min(delay, remaining)
+            time.sleep(delay)
+    raise ValueError("max_retries must be at least 1")
+
+
+async def _retry_async(
+    fn: Callable[[], Awaitable[T]],
+    exceptions: Union[Type[BaseException], Tuple[Type[BaseException], ...]],
+    max_retries: int = 3,
+    *,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    jitter: float = 0.5,
+    retry_if: Optional[Callable[[BaseException], bool]] = None,
+    retry_after: Optional[Callable[[BaseException], Optional[float]]] = None,
+    deadline: Optional[float] = None,
+) -> T:
+    """Asynchronous counterpart of :func:`_retry` for coroutine functions."""
+    start = time.monotonic()
+    for attempt in range(max_retries):
+        try:
+            return await fn()
+        except exceptions as exc:
+            if attempt == max_retries - 1:
+                raise
+            if retry_if is not None and not retry_if(exc):
+                raise
+            delay = _next_delay(
+                exc, attempt, retry_after, backoff_factor, max_backoff, jitter
+            )
+            if deadline is not None:
+                remaining = deadline - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+    raise ValueError("max_retries must be at least 1")
+
+
+def _scratch_dir() -> Path:
+    """Return the RAM-backed scratch space for runs that discard artifacts.
+
+    ``CODEX_SCRATCH`` overrides the location; otherwise ``/dev/shm`` is used
+    when present and the platform temp directory (honouring ``TMPDIR``)
+    elsewhere. The environment is read on every call so a caller can change it
+    after import.
+    """
 
-NETWORK_EXCEPTIONS = (
-    requests.exceptions.RequestException,
-    APIConnectionError,
-    APITimeoutError,
-    APIStatusError,
-) if _OPENAI_AVAILABLE else (requests.exceptions.RequestException,)
+    scratch = os.environ.get("CODEX_SCRATCH")
+    if scratch:
+        return Path(scratch)
+    if os.path.isdir("/dev/shm"):
+        return Path("/dev/shm")
+    return Path(tempfile.gettempdir())
 
 
 def run_codex_cli(
@@ -76,6 +477,10 @@ def run_codex_cli(
     output_dir: Path,
     max_retries: int = 3,
     timeout: Optional[int] = None,
+    *,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    keep_artifacts: bool = True,
 ) -> Tuple[str, Path]:
     """Run the Codex CLI and capture its final message via file output.
 
@@ -84,12 +489,23 @@ def run_codex_cli(
     ``stdout.txt`` in the execution directory, then reads the final message file
     so it can be passed to subsequent steps.
 
+    When ``keep_artifacts`` is false the CLI runs inside a scratch directory
+    chosen by :func:`_scratch_dir` (tmpfs where available). Only
+    ``final_message.txt`` is copied into ``output_dir`` and the scratch
+    directory is removed as soon as the attempt finishes.
+
     Args:
         prompt: The prompt to pass to the codex CLI.
         workdir: Directory to run the codex command from.
         output_dir: Base directory to store Codex output.
         max_retries: Maximum number of retries when a timeout occurs.
         timeout: Optional timeout for the subprocess call in seconds.
+        backoff_factor: Base delay in seconds for the exponential backoff
+            between timed-out attempts.
+        max_backoff: Upper bound in seconds for a single backoff delay.
+        keep_artifacts: Keep ``stdout.txt`` and ``time.txt`` next to the final
+            message in ``output_dir``. Disable to keep intermediate output off
+            the persistent disk.
 
     Returns:
         A tuple of the final message string and the path to the file where it
@@ -100,17 +516,33 @@ def run_codex_cli(
         Exception: Any non-timeout exceptions from subprocess.run are raised
         immediately.
     """
-    for attempt in range(max_retries):
-        tmpdir = Path(tempfile.mkdtemp(prefix="codex_exec_", dir=output_dir))
-        output_path = tmpdir / "final_message.txt"
-        stdout_path = tmpdir / "stdout.txt"
-        time_path = tmpdir / "time.txt"
+
+    # One execution directory serves every attempt; retries clear the previous
+    # attempt's final message and truncate stdout.txt instead of leaving an
+    # orphaned directory per timeout.
+    base_dir = output_dir if keep_artifacts else _scratch_dir()
+    tmpdir = Path(tempfile.mkdtemp(prefix="codex_exec_", dir=base_dir))
+    final_path = tmpdir / "final_message.txt"
+    # An absolute executable path plus close_fds=False (and no cwd,
+    # preexec_fn or session options) lets CPython spawn with posix_spawn
+    # instead of fork+exec. Python-opened descriptors are non-inheritable, so
+    # the child still only sees its stdio.
+    codex_executable = shutil.which("codex") or "codex"
+    stdout_path = tmpdir / "stdout.txt"
+    time_path = tmpdir / "time.txt"
+
+    def attempt() -> Tuple[str, Path]:
+        output_path = final_path
+        output_path.unlink(missing_ok=True)
+        time_path.unlink(missing_ok=True)
         try:
             start_time = time.time()
+            # The child writes straight into stdout.txt, so its output is
+            # streamed to disk without being pumped through Python.
             with stdout_path.open("w", encoding="utf-8") as out_f:
                 proc = subprocess.Popen(
                     [
-                        "codex",
+                        codex_executable,
                         "exec",
                         "--skip-git-repo-check",
                         "-C",
@@ -119,70 +551,111 @@ def run_codex_cli(
                         str(output_path),
                         prompt,
                     ],
-                    stdout=subprocess.PIPE,
+                    stdout=out_f,
                     stderr=subprocess.PIPE,
                     text=True,
+                    close_fds=False,
                 )
 
-                stderr_lines = []
-
-                def stream_stdout():
-                    for line in proc.stdout:  # type: ignore[arg-type]
-                        out_f.write(line)
-                        out_f.flush()
-
-                def collect_stderr():
-                    for line in proc.stderr:  # type: ignore[arg-type]
-                        stderr_lines.append(line)
-
-                t_out = threading.Thread(target=stream_stdout)
-                t_err = threading.Thread(target=collect_stderr)
-                t_out.start()
-                t_err.start()
-
                 try:
-                    proc.wait(timeout=timeout)
+                    _, stderr_output = proc.communicate(timeout=timeout)
                 except subprocess.TimeoutExpired:
                     proc.kill()
-                    t_out.join()
-                    t_err.join()
-                    if attempt == max_retries - 1:
-                        raise
-                    time.sleep(1)
-                    continue
-
-                t_out.join()
-                t_err.join()
+                    proc.communicate()
+                    raise
 
                 duration = time.time() - start_time
 
                 if proc.returncode != 0:
-                    msg = "".join(stderr_lines) or str(proc.returncode)
+                    msg = stderr_output or str(proc.returncode)
                     raise subprocess.CalledProcessError(
                         proc.returncode, proc.args, stderr=msg
                     )
 
-                if output_path.exists():
+                # Open directly instead of probing with exists() first; a
+                # missing file is the uncommon case.
+                try:
                     message = output_path.read_text(encoding="utf-8")
-                elif stdout_path.exists():
-                    message = stdout_path.read_text(encoding="utf-8")
-                    output_path.write_text(message, encoding="utf-8")
+                except FileNotFoundError:
+                    try:
+                        message = stdout_path.read_text(encoding="utf-8")
+                    except FileNotFoundError:
+                        raise FileNotFoundError(
+                            "Codex CLI did not produce a final message file or stdout output"
+                        ) from None
+                    # Hard-link instead of rewriting the same bytes; stdout.txt
+                    # stays in place for logging.
+                    try:
+                        os.link(stdout_path, output_path)
+                    except OSError:
+                        output_path.write_text(message, encoding="utf-8")
                     time_path.write_text(
                         f"{proc.returncode}\n{duration}\n", encoding="utf-8"
                     )
-                else:
-                    raise FileNotFoundError(
-                        "Codex CLI did not produce a final message file or stdout output"
+
+                if not keep_artifacts:
+                    final_dir = Path(
+                        tempfile.mkdtemp(prefix="codex_exec_", dir=output_dir)
                     )
+                    output_path = final_dir / "final_message.txt"
+                    output_path.write_text(message, encoding="utf-8")
 
                 return message, output_path
         except subprocess.CalledProcessError as e:
             # Include stderr from the Codex CLI in the raised exception for logging.
             msg = e.stderr or str(e)
             raise Exception(msg) from e
-        except Exception:
-            # Any non-timeout exception should fail fast.
-            raise
+
+    try:
+        # Only timeouts are retried; any other failure should fail fast.
+        return _retry(
+            attempt,
+            subprocess.TimeoutExpired,
+            max_retries,
+            backoff_factor=backoff_factor,
+            max_backoff=max_backoff,
+        )
+    finally:
+        if not keep_artifacts:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _require_client() -> Any:
+    """Return the shared OpenAI client or raise if it cannot be used."""
+    active_client = _lazy("client")
+    if active_client is None:
+        if not _OPENAI_AVAILABLE:
+            raise ModuleNotFoundError(
+                "openai package is required to call the OpenAI API"
+            )
+        raise RuntimeError(
+            "OpenAI client is not configured. Set the OPENAI_API_KEY environment "
+            "variable or provide an API key when constructing the client."
+        )
+    return active_client
+
+
+def _build_request_args(
+    prompt: str,
+    *,
+    web_search: bool = False,
+    model: Optional[str] = None,
+    reasoning_effort: Optional[str] = None,
+    service_tier: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Assemble the keyword arguments for a ``responses.create`` request."""
+    request_args: Dict[str, Any] = {"model": model or "gpt-4o-mini", "input": prompt}
+    if reasoning_effort:
+        request_args["reasoning"] = {"effort": reasoning_effort}
+    if service_tier:
+        request_args["service_tier"] = service_tier
+    if web_search:
+        web_search_tool = _lazy("WebSearchTool")
+        if web_search_tool is not None:
+            request_args["tools"] = [web_search_tool(type="web_search_preview")]
+        else:  # pragma: no cover - fallback for older openai versions
+            request_args["tools"] = [{"type": "web_search_preview"}]
+    return request_args
 
 
 def call_openai_api(
@@ -193,51 +666,503 @@ def call_openai_api(
     model: Optional[str] = None,
     reasoning_effort: Optional[str] = None,
     service_tier: Optional[str] = None,
-) -> dict:
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    deadline: Optional[float] = None,
+    raw: bool = False,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Any:
     """Call the OpenAI Responses API with retry logic on network errors.
 
     Args:
         prompt: Prompt string for the response request.
         web_search: When ``True``, enable hosted web search preview for the response.
-        max_retries: Maximum number of retries on network-related errors.
+        max_retries: Maximum number of retries on network-related errors,
+            rate limits (HTTP 429) and server errors (HTTP 5xx). Other HTTP
+            errors are raised without retrying.
+        backoff_factor: Base delay in seconds for the exponential backoff
+            between retries. A longer ``Retry-After`` from the server wins.
+        max_backoff: Upper bound in seconds for a single backoff delay.
+        deadline: Optional bound in seconds on the total time spent across
+            attempts. No further retry is started once it has elapsed, even
+            if ``max_retries`` has not been reached.
+        raw: Return the SDK ``Response`` object instead of converting it with
+            ``model_dump()``. Useful when only a few fields such as
+            ``output_text`` are needed, since dumping walks the whole tree.
+        rate_limiter: Optional :class:`RateLimiter` to wait on before every
+            attempt, including retries.
 
     Returns:
-        The Responses API response as a dictionary.
+        The Responses API response as a dictionary, or the SDK object when
+        ``raw`` is true.
 
     Raises:
         openai.OpenAIError: If network errors persist after retries.
         Exception: Any other exception is raised immediately.
     """
-    if client is None:
-        if not _OPENAI_AVAILABLE:
-            raise ModuleNotFoundError(
-                "openai package is required to call the OpenAI API"
-            )
-        raise RuntimeError(
-            "OpenAI client is not configured. Set the OPENAI_API_KEY environment "
-            "variable or provide an API key when constructing the client."
-        )
+    api_client = _require_client()
 
-    for attempt in range(max_retries):
+    request_args = _build_request_args(
+        prompt,
+        web_search=web_search,
+        model=model,
+        reasoning_effort=reasoning_effort,
+        service_tier=service_tier,
+    )
+
+    estimated_tokens = _estimate_tokens(prompt)
+
+    def attempt() -> Any:
+        if rate_limiter is not None:
+            rate_limiter.acquire(estimated_tokens)
+        response = api_client.responses.create(**request_args)
+        return response if raw else response.model_dump()
+
+    # Only transient network errors, rate limits and server errors are
+    # retried; anything else should fail fast.
+    return _retry(
+        attempt,
+        _lazy("NETWORK_EXCEPTIONS"),
+        max_retries,
+        backoff_factor=backoff_factor,
+        max_backoff=max_backoff,
+        retry_if=_is_retryable_api_error,
+        retry_after=_retry_after_seconds,
+        deadline=deadline,
+    )
+
+
+def call_openai_api_stream(
+    prompt: str,
+    *,
+    web_search: bool = False,
+    max_retries: int = 3,
+    model: Optional[str] = None,
+    reasoning_effort: Optional[str] = None,
+    service_tier: Optional[str] = None,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    deadline: Optional[float] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+) -> Iterator[str]:
+    """Stream the text of a Responses API answer as it is generated.
+
+    Yields each ``response.output_text.delta`` chunk as soon as it arrives so
+    callers can render output incrementally or stop consuming early. Failures
+    before the first chunk are retried through :func:`_retry` with the same
+    policy as :func:`call_openai_api`. Once text has been yielded, any error is
+    raised, because a retry would repeat output the caller has already seen.
+
+    Args:
+        prompt: Prompt string for the response request.
+        web_search: When ``True``, enable hosted web search preview.
+        max_retries: Maximum number of attempts to open the stream.
+        model: Optional model override.
+        reasoning_effort: Optional reasoning effort.
+        service_tier: Optional service tier.
+        backoff_factor: Base delay in seconds for the exponential backoff.
+            A longer ``Retry-After`` from the server wins.
+        max_backoff: Upper bound in seconds for a single backoff delay.
+        deadline: Optional bound in seconds on the total time spent opening
+            the stream across attempts. It does not limit how long the
+            caller takes to consume the text.
+        rate_limiter: Optional :class:`RateLimiter` to wait on before every
+            attempt, including retries.
+
+    Yields:
+        Successive fragments of the response text.
+    """
+    api_client = _require_client()
+    request_args = _build_request_args(
+        prompt,
+        web_search=web_search,
+        model=model,
+        reasoning_effort=reasoning_effort,
+        service_tier=service_tier,
+    )
+
+    estimated_tokens = _estimate_tokens(prompt)
+
+    def open_stream() -> Tuple[contextlib.ExitStack, Iterator[Any], Optional[str]]:
+        # Read up to the first text delta inside the retried call, so every
+        # failure that can still be retried happens before anything is yielded.
+        if rate_limiter is not None:
+            rate_limiter.acquire(estimated_tokens)
+        stack = contextlib.ExitStack()
         try:
-            request_args = {"model": model or "gpt-4o-mini", "input": prompt}
-            if reasoning_effort:
-                request_args["reasoning"] = {"effort": reasoning_effort}
-            if service_tier:
-                request_args["service_tier"] = service_tier
-            if web_search:
-                if WebSearchTool is not None:
-                    request_args["tools"] = [
-                        WebSearchTool(type="web_search_preview")
-                    ]
-                else:  # pragma: no cover - fallback for older openai versions
-                    request_args["tools"] = [{"type": "web_search_preview"}]
-            response = client.responses.create(**request_args)
-            return response.model_dump()
-        except NETWORK_EXCEPTIONS:
-            if attempt == max_retries - 1:
-                raise
-            time.sleep(1)
-        except Exception:
-            # Fail fast for non-network errors.
+            events = iter(stack.enter_context(api_client.responses.stream(**request_args)))
+            for event in events:
+                if getattr(event, "type", None) == "response.output_text.delta":
+                    return stack, events, event.delta
+            return stack, events, None
+        except BaseException:
+            stack.close()
             raise
+
+    stack, events, first = _retry(
+        open_stream,
+        _lazy("NETWORK_EXCEPTIONS"),
+        max_retries,
+        backoff_factor=backoff_factor,
+        max_backoff=max_backoff,
+        retry_if=_is_retryable_api_error,
+        retry_after=_retry_after_seconds,
+        deadline=deadline,
+    )
+    with stack:
+        if first is None:
+            return
+        yield first
+        for event in events:
+            if getattr(event, "type", None) == "response.output_text.delta":
+                yield event.delta
+
+
+def call_openai_api_batch(
+    prompts: Iterable[str],
+    *,
+    concurrency: int = 10,
+    web_search: bool = False,
+    max_retries: int = 3,
+    model: Optional[str] = None,
+    reasoning_effort: Optional[str] = None,
+    service_tier: Optional[str] = None,
+    backoff_factor: float = 0.5,
+    max_backoff: float = 8.0,
+    deadline: Optional[float] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    use_batch_api: bool = False,
+    batch_poll_interval: float = 30.0,
+) -> List[Union[dict, BaseException]]:
+    """Call the OpenAI Responses API for many prompts concurrently.
+
+    Requests are issued through :class:`openai.AsyncOpenAI` with at most
+    ``concurrency`` requests in flight at once. Each request retries network
+    errors with the same backoff policy as :func:`call_openai_api`; the
+    semaphore is released while a request is backing off so other prompts can
+    make progress.
+
+    This function drives its own event loop and therefore must not be called
+    from code that is already running inside one.
+
+    Args:
+        prompts: Prompt strings to send, one request per prompt.
+        concurrency: Maximum number of requests in flight at once.
+        web_search: When ``True``, enable hosted web search preview for every
+            request.
+        max_retries: Maximum number of retries per request on network errors.
+        model: Optional model override; defaults to the same model as
+            :func:`call_openai_api`.
+        reasoning_effort: Optional reasoning effort for every request.
+        service_tier: Optional service tier for every request.
+        backoff_factor: Base delay in seconds for the exponential backoff.
+        max_backoff: Upper bound in seconds for a single backoff delay.
+        deadline: Optional bound in seconds on the total retry time of each
+            request, as in :func:`call_openai_api`.
+        rate_limiter: Optional :class:`RateLimiter` awaited before each
+            request is sent. Waiting happens outside the concurrency limit.
+        use_batch_api: When ``True``, submit the prompts as a single Batch API
+            job via :func:`submit_batch` and block until it finishes instead
+            of issuing real-time requests. Suited to large jobs that are not
+            latency sensitive.
+        batch_poll_interval: Initial polling interval in seconds when
+            ``use_batch_api`` is enabled.
+
+    Returns:
+        A list aligned with ``prompts``. Each entry is either the response as
+        a dictionary or the exception raised for that prompt.
+    """
+    if not _OPENAI_AVAILABLE:
+        raise ModuleNotFoundError("openai package is required to call the OpenAI API")
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    prompt_list = list(prompts)
+
+    if use_batch_api:
+        batch_id = submit_batch(
+            prompt_list,
+            web_search=web_search,
+            model=model,
+            reasoning_effort=reasoning_effort,
+            service_tier=service_tier,
+        )
+        return wait_for_batch(batch_id, poll_interval=batch_poll_interval)
+
+    async def run_batch() -> List[Union[dict, BaseException]]:
+        semaphore = asyncio.Semaphore(concurrency)
+        # The async client owns connections bound to this event loop, so it is
+        # created and closed within the batch rather than at import time.
+        async with _new_async_client() as async_client:
+
+            async def one(prompt: str) -> dict:
+                request_args = _build_request_args(
+                    prompt,
+                    web_search=web_search,
+                    model=model,
+                    reasoning_effort=reasoning_effort,
+                    service_tier=service_tier,
+                )
+
+                estimated_tokens = _estimate_tokens(prompt)
+
+                async def attempt() -> dict:
+                    if rate_limiter is not None:
+                        await rate_limiter.acquire_async(estimated_tokens)
+                    async with semaphore:
+                        response = await async_client.responses.create(**request_args)
+                    return response.model_dump()
+
+                return await _retry_async(
+                    attempt,
+                    _lazy("NETWORK_EXCEPTIONS"),
+                    max_retries,
+                    backoff_factor=backoff_factor,
+                    max_backoff=max_backoff,
+                    retry_if=_is_retryable_api_error,
+                    retry_after=_retry_after_seconds,
+                    deadline=deadline,
+                )
+
+            return await asyncio.gather(
+                *(one(prompt) for prompt in prompt_list), return_exceptions=True
+            )
+
+    return asyncio.run(run_batch())
+
+
+_MULTI_PROMPT_INSTRUCTIONS = (
+    "Process each item below independently. Return exactly one JSON object per "
+    'line and nothing else, in the form {"id": <item id>, "output": "<your '
+    'response to that item\'s prompt>"}.'
+)
+
+
+def _response_text(response: Any) -> str:
+    """Return the first text content block of a Responses API result."""
+    if not isinstance(response, dict):
+        return getattr(response, "output_text", "") or ""
+    for item in response.get("output") or []:
+        for content in item.get("content") or []:
+            text = content.get("text")
+            if text is not None:
+                return text
+    return ""
+
+
+def _parse_multi_output(text: str, expected: Iterable[int]) -> Dict[int, str]:
+    """Parse JSONL ``{"id", "output"}`` lines, keeping only ``expected`` ids."""
+    wanted = set(expected)
+    outputs: Dict[int, str] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = _json_loads(line)
+        except ValueError:
+            continue
+        if not isinstance(record, dict):
+            continue
+        idx = record.get("id")
+        output = record.get("output")
+        if isinstance(idx, int) and idx in wanted and idx not in outputs:
+            outputs[idx] = (
+                output if isinstance(output, str) else _json_dumps(output).decode("utf-8")
+            )
+    return outputs
+
+
+def call_openai_api_multi(
+    prompts: Iterable[str],
+    *,
+    chunk_size: int = 20,
+    max_rounds: int = 2,
+    web_search: bool = False,
+    max_retries: int = 3,
+    model: Optional[str] = None,
+    reasoning_effort: Optional[str] = None,
+    service_tier: Optional[str] = None,
+) -> List[str]:
+    """Answer many short prompts with few requests by packing them together.
+
+    Up to ``chunk_size`` prompts are sent in a single request that asks the
+    model to answer each one on its own JSON line, keyed by the prompt's
+    index. This saves a round trip and the shared instruction tokens for each
+    packed prompt. Prompts whose answers are missing or malformed are packed
+    again for up to ``max_rounds`` rounds and then sent individually through
+    :func:`call_openai_api`.
+
+    Args:
+        prompts: Prompt strings to answer.
+        chunk_size: Maximum number of prompts packed into one request.
+        max_rounds: Number of packed rounds before falling back to one
+            request per remaining prompt.
+        web_search: When ``True``, enable hosted web search preview.
+        max_retries: Maximum number of retries per request.
+        model: Optional model override.
+        reasoning_effort: Optional reasoning effort.
+        service_tier: Optional service tier.
+
+    Returns:
+        The text answer for each prompt, aligned with ``prompts``.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    prompt_list = list(prompts)
+    request_kwargs: Dict[str, Any] = {
+        "web_search": web_search,
+        "max_retries": max_retries,
+        "model": model,
+        "reasoning_effort": reasoning_effort,
+        "service_tier": service_tier,
+    }
+    results: Dict[int, str] = {}
+    pending = list(range(len(prompt_list)))
+
+    for _ in range(max_rounds):
+        if not pending:
+            break
+        remaining = iter(pending)
+        while True:
+            chunk = list(itertools.islice(remaining, chunk_size))
+            if not chunk:
+                break
+            packed = "\n".join(
+                _json_dumps({"id": idx, "prompt": prompt_list[idx]}).decode("utf-8")
+                for idx in chunk
+            )
+            response = call_openai_api(
+                f"{_MULTI_PROMPT_INSTRUCTIONS}\n\n{packed}", raw=True, **request_kwargs
+            )
+            results.update(_parse_multi_output(_response_text(response), chunk))
+        pending = [idx for idx in pending if idx not in results]
+
+    for idx in pending:
+        results[idx] = _response_text(
+            call_openai_api(prompt_list[idx], raw=True, **request_kwargs)
+        )
+
+    return [results[idx] for idx in range(len(prompt_list))]
+
+
+_BATCH_TERMINAL_FAILURES = ("failed", "expired", "cancelled")
+
+
+def submit_batch(
+    prompts: Iterable[str],
+    *,
+    web_search: bool = False,
+    model: Optional[str] = None,
+    reasoning_effort: Optional[str] = None,
+    service_tier: Optional[str] = None,
+    completion_window: str = "24h",
+) -> str:
+    """Submit prompts as a single OpenAI Batch API job.
+
+    One JSONL file with a ``/v1/responses`` request per prompt is uploaded and
+    a batch is created from it. Each request's ``custom_id`` is the index of
+    its prompt so results can be matched back by :func:`wait_for_batch`.
+
+    Returns:
+        The identifier of the created batch.
+    """
+    batch_client = _require_client()
+
+    lines: List[bytes] = []
+    for idx, prompt in enumerate(prompts):
+        body = _build_request_args(
+            prompt,
+            model=model,
+            reasoning_effort=reasoning_effort,
+            service_tier=service_tier,
+        )
+        if web_search:
+            body["tools"] = [{"type": "web_search_preview"}]
+        lines.append(
+            _json_dumps(
+                {
+                    "custom_id": str(idx),
+                    "method": "POST",
+                    "url": "/v1/responses",
+                    "body": body,
+                }
+            )
+        )
+    payload = b"\n".join(lines) + b"\n"
+
+    input_file = batch_client.files.create(
+        file=("batch.jsonl", payload), purpose="batch"
+    )
+    batch = batch_client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/responses",
+        completion_window=completion_window,
+    )
+    return batch.id
+
+
+def wait_for_batch(
+    batch_id: str,
+    *,
+    poll_interval: float = 30.0,
+    max_poll_interval: float = 300.0,
+) -> List[Union[dict, BaseException]]:
+    """Block until a Batch API job finishes and return its responses.
+
+    The batch status is polled with the same exponential backoff used for
+    retries, starting at ``poll_interval`` seconds and never waiting longer
+    than ``max_poll_interval`` between polls.
+
+    Returns:
+        A list ordered by the ``custom_id`` assigned in :func:`submit_batch`.
+        Each entry is the response body as a dictionary, or an
+        :class:`OpenAIBatchError` for requests that failed.
+
+    Raises:
+        OpenAIBatchError: If the batch itself fails, expires or is cancelled.
+    """
+    batch_client = _require_client()
+
+    attempt = 0
+    while True:
+        batch = batch_client.batches.retrieve(batch_id)
+        if batch.status == "completed":
+            break
+        if batch.status in _BATCH_TERMINAL_FAILURES:
+            raise OpenAIBatchError(f"Batch {batch_id} finished with status {batch.status!r}")
+        time.sleep(
+            _backoff_delay(
+                attempt,
+                backoff_factor=poll_interval,
+                max_backoff=max_poll_interval,
+                jitter=0.1,
+            )
+        )
+        attempt += 1
+
+    collected: Dict[int, Union[dict, BaseException]] = {}
+    for file_id in (batch.output_file_id, getattr(batch, "error_file_id", None)):
+        if not file_id:
+            continue
+        for line in batch_client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = _json_loads(line)
+            idx = int(record["custom_id"])
+            response = record.get("response") or {}
+            status_code = response.get("status_code")
+            if record.get("error") or (status_code is not None and status_code >= 400):
+                collected[idx] = OpenAIBatchError(
+                    str(record.get("error") or response.get("body"))
+                )
+            else:
+                collected[idx] = response.get("body") or {}
+
+    request_counts = getattr(batch, "request_counts", None)
+    total = getattr(request_counts, "total", None) or (max(collected) + 1 if collected else 0)
+    return [
+        collected.get(idx, OpenAIBatchError(f"No result returned for request {idx}"))
+        for idx in range(total)
+    ]
@@ -1,15 +1,53 @@
+import concurrent.futures
+import contextlib
+import functools
 import itertools
+import math
+import os
+import re
 import json
+import shutil
 import threading
 import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 import tempfile
 import traceback
 import subprocess
 import sys
 
-from openai_utils import GENERATED_DIR, call_openai_api, run_codex_cli
+from openai_utils import (
+    GENERATED_DIR,
+    _json_loads as _load_json,
+    call_openai_api,
+    call_openai_api_batch,
+    ensure_dir,
+    run_codex_cli,
+)
+from response_cache import ResponseCache
+
+try:
+    import orjson
+except ModuleNotFoundError:
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import fcntl
+except ModuleNotFoundError:  # Windows
+    fcntl = None  # type: ignore[assignment]
 
 
 class FlowCancelled(Exception):
@@ -34,15 +72,434 @@ class FlowConfig(list):
         )
 
 
+def _dump_json_pretty(obj: Any) -> bytes:
+    """Serialise ``obj`` as indented UTF-8 JSON, using ``orjson`` when installed.
+
+    Unserialisable values are converted with ``str``. Raises ``TypeError`` if
+    the object still cannot be encoded (``orjson.JSONEncodeError`` is a
+    ``TypeError`` subclass).
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str
+        )
+    return json.dumps(obj, ensure_ascii=False, indent=2, default=str).encode("utf-8")
+
+
+def _write_bytes(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` with raw ``os`` calls.
+
+    Step artifacts (OpenAI responses, bucket files) and error files are small
+    and written once; this skips building a Python file object and text
+    wrapper for each.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+_DEFAULT_PIPE_SIZE = 1 << 16
+_LARGE_PIPE_SIZE = 1 << 20
+
+
+def _grow_pipe(fd: int, payload_size: int) -> None:
+    """Enlarge a pipe (Linux only) before writing a payload to it.
+
+    ``communicate`` feeds stdin in ``PIPE_BUF`` slices and waits whenever the
+    pipe is full, so a larger pipe lets a big input go through with fewer
+    blocking round trips. Failures (e.g. over ``fs.pipe-max-size``) are
+    ignored; the default size still works.
+    """
+    if payload_size <= _DEFAULT_PIPE_SIZE:
+        return
+    set_size = getattr(fcntl, "F_SETPIPE_SZ", None)
+    if set_size is None:
+        return
+    try:
+        fcntl.fcntl(fd, set_size, min(payload_size, _LARGE_PIPE_SIZE))
+    except OSError:
+        pass
+
+
+# Bounded so a long-lived process expanding many key files does not keep every
+# file's text, or the stale text of edited files, alive forever.
+@functools.lru_cache(maxsize=256)
+def _read_text_cached(path: str, mtime_ns: int, size: int) -> str:
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _read_text(path: Union[str, Path]) -> str:
+    """Read a UTF-8 prompt or key file, reusing earlier reads of the same file.
+
+    The cache key includes the file's modification time and size, so an edited
+    file is re-read while repeated reads across flows cost only a ``stat``.
+    """
+    resolved = os.path.abspath(path)
+    st = os.stat(resolved)
+    return _read_text_cached(resolved, st.st_mtime_ns, st.st_size)
+
+
+def _parse_branch_inputs(data: Union[str, bytes]) -> Tuple[str, ...]:
+    items = _load_json(data)
+    if not isinstance(items, list):
+        raise ValueError("Expected JSON array")
+    return tuple(item if isinstance(item, str) else json.dumps(item) for item in items)
+
+
+# Outputs longer than this (characters or bytes) are parsed on every call:
+# caching them would pin large strings and their branch copies in memory and
+# hash each one in full.
+_BRANCH_CACHE_MAX_LEN = 64 * 1024
+
+_parse_branch_inputs_cached = functools.lru_cache(maxsize=32)(_parse_branch_inputs)
+
+
+def _branch_inputs(data: Union[str, bytes]) -> Tuple[str, ...]:
+    """Parse an array step's output into the input text of each branch.
+
+    String items are passed through and other items are re-serialised with
+    :func:`json.dumps`. Outputs up to ``_BRANCH_CACHE_MAX_LEN`` long are
+    cached, so identical small arrays (repeated flows, cached responses) are
+    parsed and serialised once.
+
+    Raises:
+        ValueError: If ``data`` is not valid JSON or not a JSON array.
+    """
+    if len(data) > _BRANCH_CACHE_MAX_LEN:
+        return _parse_branch_inputs(data)
+    return _parse_branch_inputs_cached(data)
+
+
+_MAX_READ_WORKERS = 16
+
+
+def _read_texts(paths: Sequence[str]) -> List[str]:
+    """Read many files with :func:`_read_text`, overlapping their I/O.
+
+    Key files can list hundreds of paths, possibly on a network filesystem,
+    so reading them one after another serialises every open and read.
+    Results are returned in the order of ``paths``; the first error raised
+    for any path propagates.
+    """
+    if len(paths) < 2:
+        return [_read_text(p) for p in paths]
+    workers = min(_MAX_READ_WORKERS, len(paths))
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="read"
+    ) as pool:
+        return list(pool.map(_read_text, paths))
+
+
+class StepCounts:
+    """Per-step counts of active flows that workers update without locking.
+
+    Every thread keeps its own shard of counters, so incrementing and
+    decrementing on the hot path is a single-writer list update. The progress
+    monitor sums the shards in :meth:`snapshot`. The registration lock is only
+    taken the first time a thread touches the counters, and when reading.
+    ``on_change`` is called after every update, e.g. to wake a progress
+    display.
+    """
+
+    def __init__(self, size: int, on_change: Optional[Callable[[], None]] = None) -> None:
+        self._size = size
+        self._on_change = on_change
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, List[int]]] = []
+        self._register_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, idx: int, delta: int) -> None:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0] * self._size
+            self._local.shard = shard
+            with self._register_lock:
+                self._shards.append((threading.current_thread(), shard))
+        shard[idx] += delta
+        if self._on_change is not None:
+            self._on_change()
+
+    def snapshot(self) -> List[int]:
+        with self._register_lock:
+            # A finished thread has balanced every increment with a decrement,
+            # so its shard no longer contributes and can be dropped.
+            self._shards = [
+                (thread, shard) for thread, shard in self._shards if thread.is_alive()
+            ]
+            shards = [shard for _, shard in self._shards]
+        totals = [0] * self._size
+        for shard in shards:
+            for idx, value in enumerate(shard):
+                totals[idx] += value
+        return totals
+
+
+_ERROR_DIR_COUNTER = itertools.count()
+
+
+def _make_numbered_dir(parent: Path, prefix: str, counter: Iterator[int]) -> Path:
+    """Create ``parent/<prefix><n>`` using the next free number from ``counter``.
+
+    A plain ``mkdir`` is far cheaper than ``tempfile.mkdtemp`` (which draws
+    random names and may retry), and ``next()`` on an ``itertools.count`` is
+    atomic, so concurrent callers never race for the same name. Numbers already
+    taken on disk, e.g. by an earlier run sharing ``parent``, are skipped.
+    """
+    while True:
+        path = parent / f"{prefix}{next(counter):06d}"
+        try:
+            path.mkdir()
+        except FileExistsError:
+            continue
+        return path
+
+
+def _adjust_step_count(
+    step_counts: Union[StepCounts, List[int]],
+    lock: Optional[threading.Lock],
+    idx: int,
+    delta: int,
+) -> None:
+    if isinstance(step_counts, StepCounts):
+        step_counts.add(idx, delta)
+        return
+    with lock:  # type: ignore[union-attr]
+        step_counts[idx] += delta
+
+
+class _BranchTask:
+    """A unit of branch work that runs exactly once, on whichever thread claims it."""
+
+    __slots__ = ("fn", "claim", "future")
+
+    def __init__(self, fn: Callable[[], Any]) -> None:
+        self.fn = fn
+        self.claim = threading.Lock()
+        self.future: concurrent.futures.Future = concurrent.futures.Future()
+
+    def run(self) -> None:
+        if not self.claim.acquire(blocking=False):
+            return
+        try:
+            self.future.set_result(self.fn())
+        except BaseException as exc:
+            self.future.set_exception(exc)
+
+
+def _run_branches(
+    executor: concurrent.futures.Executor, fns: List[Callable[[], Any]]
+) -> List[concurrent.futures.Future]:
+    """Run ``fns`` on ``executor`` and return their futures once all are done.
+
+    The calling thread also runs any task the pool has not started yet,
+    rather than just blocking. It only ever waits on tasks that are already
+    running, so branches nested inside branches cannot deadlock a bounded
+    executor.
+    """
+    tasks = [_BranchTask(fn) for fn in fns]
+    for task in tasks:
+        executor.submit(task.run)
+    for task in tasks:
+        task.run()
+    futures = [task.future for task in tasks]
+    concurrent.futures.wait(futures)
+    return futures
+
+
+class _PendingBatch:
+    def __init__(self) -> None:
+        self.prompts: List[str] = []
+        self.results: List[Union[Dict[str, Any], BaseException]] = []
+        self.done = threading.Event()
+
+
+class OpenAIStepBatcher:
+    """Pool ``"batchable": true`` OpenAI requests from concurrent flows.
+
+    The first flow to reach a batchable step opens a batch and waits
+    ``window`` seconds while other flows add their prompts, then submits them
+    all as one Batch API job through :func:`call_openai_api_batch`. Requests
+    only share a batch when their web search setting and OpenAI options match.
+    Every caller blocks until the job finishes and receives its own response,
+    or the exception raised for its prompt.
+    """
+
+    def __init__(self, window: float = 5.0, poll_interval: float = 30.0) -> None:
+        if window < 0:
+            raise ValueError("window must be non-negative")
+        self.window = window
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._open: Dict[Tuple[Any, ...], _PendingBatch] = {}
+
+    def call(
+        self, prompt: str, *, web_search: bool = False, **openai_kwargs: str
+    ) -> Dict[str, Any]:
+        key = (web_search, tuple(sorted(openai_kwargs.items())))
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if batch is None:
+                batch = _PendingBatch()
+                self._open[key] = batch
+            slot = len(batch.prompts)
+            batch.prompts.append(prompt)
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                del self._open[key]
+            try:
+                batch.results = call_openai_api_batch(
+                    batch.prompts,
+                    web_search=web_search,
+                    use_batch_api=True,
+                    batch_poll_interval=self.poll_interval,
+                    **openai_kwargs,
+                )
+            except BaseException as exc:
+                batch.results = [exc] * len(batch.prompts)
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        result = batch.results[slot]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+
+def _write_cached_final_message(curr_dir: Path, output: str) -> Path:
+    """Lay out a cached codex result like a fresh ``run_codex_cli`` call."""
+    exec_dir = Path(tempfile.mkdtemp(prefix="codex_exec_", dir=curr_dir))
+    final_path = exec_dir / "final_message.txt"
+    final_path.write_text(output, encoding="utf-8")
+    return final_path
+
+
+# Anything a shell would interpret (quoting, expansion, redirection, globbing,
+# assignments, comments, etc.) forces a command through ``/bin/sh``.
+_SHELL_META = frozenset("|&;<>()$`\\\"'*?[]#~=%{}!\n")
+
+# Names that /bin/sh (dash, bash, busybox) implements itself. The builtin and
+# the same-named binary on PATH can behave differently (dash's ``echo`` prints
+# ``-e`` literally, ``/usr/bin/echo`` takes it as an option), so these always
+# go through the shell.
+_SHELL_BUILTINS = frozenset(
+    {
+        ".", ":", "[", "alias", "bg", "break", "builtin", "cd", "command",
+        "continue", "echo", "eval", "exec", "exit", "export", "false", "fc",
+        "fg", "getopts", "hash", "jobs", "kill", "let", "local", "newgrp",
+        "printf", "pwd", "read", "readonly", "return", "set", "shift",
+        "source", "test", "times", "trap", "true", "type", "ulimit", "umask",
+        "unalias", "unset", "wait",
+    }
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _which(name: str) -> Optional[str]:
+    return shutil.which(name)
+
+
+def _cmd_argv(cmd: str) -> Optional[Tuple[str, ...]]:
+    """Return ``cmd`` as an argv tuple when running it needs no shell.
+
+    Plain commands (words separated by spaces or tabs, naming an executable
+    found on ``PATH``) are run directly, which skips starting ``/bin/sh`` and, with an
+    absolute executable path, lets CPython use ``posix_spawn``. Everything
+    else, including any command whose first word is a shell builtin, returns
+    ``None`` so the shell keeps its own semantics.
+    """
+    if _SHELL_META.intersection(cmd):
+        return None
+    # Quotes, escapes and expansions are all in _SHELL_META, so what is left
+    # only needs field splitting; shlex.split is not needed. The default IFS is
+    # space, tab and newline (newline is in _SHELL_META), so other whitespace
+    # such as ``\f`` or NBSP stays inside a word, as it does under /bin/sh.
+    words = [word for word in cmd.replace("\t", " ").split(" ") if word]
+    if not words or words[0] in _SHELL_BUILTINS:
+        return None
+    executable = _which(words[0])
+    if executable is None:
+        return None
+    return (executable, *words[1:])
+
+
+def _never() -> bool:
+    return False
+
+
+class _StepPlan(NamedTuple):
+    """Branch-independent attributes of a step, resolved once per flow."""
+
+    type: Optional[str]
+    prompt: str
+    prmpt_file: Optional[str]
+    cmd: Optional[str]
+    cmd_argv: Optional[Tuple[str, ...]]
+    stdin_file: Optional[str]
+    is_array: bool
+    web_search: bool
+    exit_on_empty_response: bool
+    identifier: str
+    openai_kwargs: Dict[str, str]
+    cacheable: bool
+    batchable: bool
+
+
+def _compile_step(
+    step: Dict[str, Any],
+    idx: int,
+    openai_request_options: Optional[Dict[str, Optional[str]]],
+) -> _StepPlan:
+    cmd = step.get("cmd") if "cmd" in step else None
+    openai_kwargs: Dict[str, str] = {}
+    if step.get("type") == "openai" and openai_request_options:
+        for key in ("model", "service_tier", "reasoning_effort"):
+            value = openai_request_options.get(key)
+            if value:
+                openai_kwargs[key] = value
+    return _StepPlan(
+        type=step.get("type"),
+        prompt=step.get("prompt", ""),
+        prmpt_file=step.get("prmpt_file"),
+        cmd=cmd,
+        cmd_argv=_cmd_argv(cmd) if isinstance(cmd, str) else None,
+        stdin_file=step.get("stdin_file"),
+        is_array=bool(step.get("array")),
+        web_search=step.get("web_search") is True,
+        exit_on_empty_response=step.get("exit_on_empty_response") is True,
+        identifier=str(step.get("name") or f"step_{idx}"),
+        openai_kwargs=openai_kwargs,
+        cacheable=step.get("cache") is not False,
+        batchable=step.get("batchable") is True,
+    )
+
+
 def _run_flow(
     config: List[Dict[str, Any]],
-    step_counts: List[int],
-    lock: threading.Lock,
+    step_counts: Union[StepCounts, List[int]],
+    lock: Optional[threading.Lock],
     workdir: Path,
     flow_dir: Path,
     codex_timeout: Optional[int] = None,
     cancel_event: Optional[threading.Event] = None,
     openai_request_options: Optional[Dict[str, Optional[str]]] = None,
+    branch_executor: Optional[concurrent.futures.Executor] = None,
+    response_cache: Optional[ResponseCache] = None,
+    openai_batcher: Optional[OpenAIStepBatcher] = None,
+    codex_slots: Optional[threading.Semaphore] = None,
+    save_openai_responses: bool = True,
+    keep_codex_artifacts: bool = True,
 ) -> Tuple[List[Tuple[str, Optional[Path], Path]], bool]:
     """Execute a single flow defined in ``config``.
 
@@ -53,14 +510,58 @@ def _run_flow(
     last step was a codex invocation, and the directory for that branch. A
     boolean flag is returned alongside the results indicating whether any part
     of the flow failed.
+
+    Active step counts are tracked in ``step_counts``: either a
+    :class:`StepCounts` instance, or a plain list guarded by ``lock``.
+
+    Array branches run on ``branch_executor`` when one is given, so a whole
+    orchestration shares one bounded pool; otherwise each array step starts a
+    temporary pool with one thread per branch.
+
+    With a ``response_cache``, OpenAI and codex steps whose prompt and request
+    options match an earlier call reuse its result instead of running again.
+    Because a step's prompt includes the previous output, flows sharing a
+    prefix of identical steps execute that prefix only once. Steps set
+    ``"cache": false`` to always run.
+
+    OpenAI steps marked ``"batchable": true`` go through ``openai_batcher``
+    when one is given, so concurrent flows share a Batch API job.
+
+    Codex steps hold one of ``codex_slots`` while the CLI runs, which bounds
+    the number of concurrent codex processes across every flow sharing it.
+
+    Each OpenAI step's full response is written to
+    ``step_{idx}_openai_response.json`` unless ``save_openai_responses`` is
+    false, which skips serialising it; the step text and bucket files are
+    always written.
+
+    With ``keep_codex_artifacts`` false, codex steps run in scratch space and
+    only keep ``final_message.txt`` (see :func:`run_codex_cli`).
     """
 
     flow_failed = False
+    plan = [
+        _compile_step(step, idx, openai_request_options)
+        for idx, step in enumerate(config)
+    ]
+    # Bound once: this is checked on entry to every step of every branch.
+    is_cancelled = cancel_event.is_set if cancel_event is not None else _never
 
     def mark_failed() -> None:
         nonlocal flow_failed
         flow_failed = True
 
+    created_error_bases: Set[Path] = set()
+
+    def new_error_dir(curr_dir: Path) -> Path:
+        # Each directory's ``errors`` folder is created on its first failure
+        # only; later failures go straight to allocating a numbered subdir.
+        errors_base = curr_dir / "errors"
+        if errors_base not in created_error_bases:
+            errors_base.mkdir(parents=True, exist_ok=True)
+            created_error_bases.add(errors_base)
+        return _make_numbered_dir(errors_base, "run_", _ERROR_DIR_COUNTER)
+
     def with_recorded_output(
         outputs: Dict[str, str],
         step: Dict[str, Any],
@@ -146,443 +647,771 @@ def _run_flow(
         prev_path: Optional[Path],
         curr_dir: Path,
         outputs: Dict[str, str],
+        prev_encoded: Optional[bytes] = None,
     ) -> List[Tuple[str, Optional[Path], Path]]:
-        if cancel_event and cancel_event.is_set():
-            raise FlowCancelled()
-        if idx >= len(config):
-            return [(prev_output, prev_path, curr_dir)]
+        # ``prev_encoded`` is ``prev_output`` as UTF-8 when the previous step
+        # already had the bytes at hand, so piping it on does not re-encode.
+        # ``prev_source`` is the cmd output file holding exactly those bytes,
+        # which a following cmd step reads as its stdin.
+        prev_source: Optional[Path] = None
+        # Linear steps loop here; only array fan-out recurses, once per branch.
+        while True:
+            if is_cancelled():
+                raise FlowCancelled()
+            if idx >= len(config):
+                return [(prev_output, prev_path, curr_dir)]
 
-        step = config[idx]
-        step_type = step.get("type")
+            step = config[idx]
+            step_plan = plan[idx]
+            step_type = step_plan.type
 
-        with lock:
-            step_counts[idx] += 1
+            _adjust_step_count(step_counts, lock, idx, 1)
 
-        try:
-            step_input = resolve_step_inputs(step, idx, outputs, prev_output)
-            prompt = step.get("prompt", "")
-            prmpt_file = step.get("prmpt_file")
-            if prmpt_file and not prompt:
-                prompt = Path(prmpt_file).read_text(encoding="utf-8")
-            if step_input:
-                prompt = f"{prompt}\n{step_input}".strip()
-
-            step_bucket_values: Optional[Dict[str, str]] = None
-            if step_type == "codex":
-                output, path = run_codex_cli(
-                    prompt, workdir, curr_dir, timeout=codex_timeout
-                )
-            elif step_type == "openai":
-                web_search_enabled = step.get("web_search") is True
-                openai_kwargs: Dict[str, str] = {}
-                if openai_request_options:
-                    for key in ("model", "service_tier", "reasoning_effort"):
-                        value = openai_request_options.get(key)
-                        if value:
-                            openai_kwargs[key] = value
-                response = call_openai_api(
-                    prompt,
-                    web_search=web_search_enabled,
-                    **openai_kwargs,
-                )
-                output = (
-                    response.get("output", [{}])[0]
-                    .get("content", [{}])[0]
-                    .get("text", "")
-                )
-                raw_text_output = output
-                bucket_config = step.get("response_buckets")
-                bucket_values: Optional[Dict[str, str]] = None
-                primary_bucket = step.get("primary_bucket")
-                if bucket_config:
-                    parsed_buckets: Optional[Dict[str, Any]] = None
+            try:
+                step_input = resolve_step_inputs(step, idx, outputs, prev_output)
+                prompt = step_plan.prompt
+                if step_plan.prmpt_file and not prompt:
+                    prompt = _read_text(step_plan.prmpt_file)
+                if step_input:
+                    # str.strip only inspects the ends, so the one copy made here
+                    # is the join; with no prompt the input is used directly.
+                    prompt = (f"{prompt}\n{step_input}" if prompt else step_input).strip()
+
+                step_bucket_values: Optional[Dict[str, str]] = None
+                output_encoded: Optional[bytes] = None
+                output_source: Optional[Path] = None
+                if step_type == "codex":
+
+                    def invoke_codex() -> Tuple[str, Path]:
+                        if codex_slots is None:
+                            return run_codex_cli(
+                                prompt,
+                                workdir,
+                                curr_dir,
+                                timeout=codex_timeout,
+                                keep_artifacts=keep_codex_artifacts,
+                            )
+                        with codex_slots:
+                            return run_codex_cli(
+                                prompt,
+                                workdir,
+                                curr_dir,
+                                timeout=codex_timeout,
+                                keep_artifacts=keep_codex_artifacts,
+                            )
+
+                    if response_cache is not None and step_plan.cacheable:
+                        produced: List[Path] = []
+
+                        def run_codex() -> Dict[str, str]:
+                            text, final_path = invoke_codex()
+                            produced.append(final_path)
+                            return {"output": text}
+
+                        cached = response_cache.get_or_compute(
+                            ResponseCache.key("codex", prompt, workdir=str(workdir)),
+                            run_codex,
+                        )
+                        output = cached["output"]
+                        path = (
+                            produced[0]
+                            if produced
+                            else _write_cached_final_message(curr_dir, output)
+                        )
+                    else:
+                        output, path = invoke_codex()
+                elif step_type == "openai":
+                    def request() -> Dict[str, Any]:
+                        if openai_batcher is not None and step_plan.batchable:
+                            return openai_batcher.call(
+                                prompt,
+                                web_search=step_plan.web_search,
+                                **step_plan.openai_kwargs,
+                            )
+                        return call_openai_api(
+                            prompt,
+                            web_search=step_plan.web_search,
+                            **step_plan.openai_kwargs,
+                        )
+
+                    if response_cache is not None and step_plan.cacheable:
+                        response = response_cache.get_or_compute(
+                            ResponseCache.key(
+                                "openai",
+                                prompt,
+                                web_search=step_plan.web_search,
+                                **step_plan.openai_kwargs,
+                            ),
+                            request,
+                        )
+                    else:
+                        response = request()
                     try:
-                        parsed = json.loads(raw_text_output)
-                    except json.JSONDecodeError:
-                        parsed = None
-                    if isinstance(parsed, dict):
-                        parsed_buckets = parsed
-                    if parsed_buckets:
-                        configured_names: Optional[List[str]] = None
-                        if isinstance(bucket_config, dict):
-                            configured_names = [str(name) for name in bucket_config.keys()]
-                        elif isinstance(bucket_config, (list, tuple, set)):
-                            configured_names = [str(name) for name in bucket_config]
-                        bucket_values = {}
-                        for key, value in parsed_buckets.items():
-                            key_str = str(key)
-                            if configured_names and key_str not in configured_names:
-                                continue
-                            if isinstance(value, str):
-                                bucket_values[key_str] = value
-                            else:
-                                bucket_values[key_str] = json.dumps(
-                                    value, ensure_ascii=False, default=str
-                                )
-                        if configured_names:
-                            # Ensure placeholders exist for configured buckets even if missing.
-                            for expected in configured_names:
-                                if expected not in bucket_values and parsed_buckets.get(expected) is None:
-                                    bucket_values[expected] = ""
-                        if not primary_bucket:
+                        output = response["output"][0]["content"][0]["text"]
+                    except KeyError:
+                        # A missing key falls back to the original lenient walk,
+                        # which reads it as empty. An empty ``output`` or
+                        # ``content`` list still raises IndexError and fails
+                        # the step, as it always has.
+                        output = (
+                            response.get("output", [{}])[0]
+                            .get("content", [{}])[0]
+                            .get("text", "")
+                        )
+                    raw_text_output = output
+                    bucket_config = step.get("response_buckets")
+                    bucket_values: Optional[Dict[str, str]] = None
+                    primary_bucket = step.get("primary_bucket")
+                    if bucket_config:
+                        parsed_buckets: Optional[Dict[str, Any]] = None
+                        try:
+                            parsed = _load_json(raw_text_output)
+                        except json.JSONDecodeError:
+                            parsed = None
+                        if isinstance(parsed, dict):
+                            parsed_buckets = parsed
+                        if parsed_buckets:
+                            configured_names: Optional[List[str]] = None
+                            if isinstance(bucket_config, dict):
+                                configured_names = [str(name) for name in bucket_config.keys()]
+                            elif isinstance(bucket_config, (list, tuple, set)):
+                                configured_names = [str(name) for name in bucket_config]
+                            bucket_values = {}
+                            for key, value in parsed_buckets.items():
+                                key_str = str(key)
+                                if configured_names and key_str not in configured_names:
+                                    continue
+                                if isinstance(value, str):
+                                    bucket_values[key_str] = value
+                                else:
+                                    bucket_values[key_str] = json.dumps(
+                                        value, ensure_ascii=False, default=str
+                                    )
                             if configured_names:
-                                for name in configured_names:
-                                    if name in bucket_values:
-                                        primary_bucket = name
-                                        break
-                            if not primary_bucket and bucket_values:
-                                primary_bucket = next(iter(bucket_values))
-                        if primary_bucket and bucket_values.get(primary_bucket) is not None:
-                            output = bucket_values[primary_bucket]
+                                # Ensure placeholders exist for configured buckets even if missing.
+                                for expected in configured_names:
+                                    if (
+                                        expected not in bucket_values
+                                        and parsed_buckets.get(expected) is None
+                                    ):
+                                        bucket_values[expected] = ""
+                            if not primary_bucket:
+                                if configured_names:
+                                    for name in configured_names:
+                                        if name in bucket_values:
+                                            primary_bucket = name
+                                            break
+                                if not primary_bucket and bucket_values:
+                                    primary_bucket = next(iter(bucket_values))
+                            if primary_bucket and bucket_values.get(primary_bucket) is not None:
+                                output = bucket_values[primary_bucket]
+                            else:
+                                output = raw_text_output
                         else:
-                            output = raw_text_output
+                            bucket_values = None
+                    if save_openai_responses:
+                        response_path = curr_dir / f"step_{idx}_openai_response.json"
+                        try:
+                            response_bytes = _dump_json_pretty(response)
+                        except TypeError:
+                            # Fallback to storing a string representation if JSON
+                            # encoding fails.
+                            response_bytes = str(response).encode("utf-8")
+                        _write_bytes(response_path, response_bytes)
+                    path = curr_dir / f"step_{idx}_openai.txt"
+                    output_encoded = output.encode("utf-8")
+                    _write_bytes(path, output_encoded)
+                    if bucket_values:
+                        step_bucket_values = bucket_values
+                        for bucket_name, bucket_value in bucket_values.items():
+                            safe_bucket = "".join(
+                                ch if ch.isalnum() or ch in ("_", "-") else "_"
+                                for ch in str(bucket_name)
+                            )
+                            bucket_path = (
+                                curr_dir
+                                / f"step_{idx}_openai_bucket_{safe_bucket or 'bucket'}.txt"
+                            )
+                            _write_bytes(bucket_path, bucket_value.encode("utf-8"))
+                elif step_plan.cmd is not None:
+                    stdin_source: Optional[Path] = None
+                    if step_input is prev_output and prev_encoded is not None:
+                        stdin_bytes = prev_encoded
+                        stdin_source = prev_source
                     else:
-                        bucket_values = None
-                response_path = curr_dir / f"step_{idx}_openai_response.json"
-                try:
-                    response_path.write_text(
-                        json.dumps(
-                            response,
-                            ensure_ascii=False,
-                            indent=2,
-                            default=str,
-                        ),
-                        encoding="utf-8",
+                        stdin_bytes = None
+                    stdin_file = step_plan.stdin_file
+                    if stdin_file:
+                        stdin_path = Path(stdin_file)
+                        stdin_content = stdin_path.read_text(encoding="utf-8")
+                        if step_input:
+                            step_input = "\n".join([step_input, stdin_content])
+                        else:
+                            step_input = stdin_content
+                        stdin_bytes = None
+                        stdin_source = None
+                    if stdin_bytes is None:
+                        stdin_bytes = (step_input or "").encode("utf-8")
+                    # The child writes straight into the step file instead of
+                    # having its output buffered in memory and written back out.
+                    # Likewise, input that is exactly the previous cmd step's
+                    # output file is handed to the child as that file rather
+                    # than being written through a pipe.
+                    stdout_file = curr_dir / f"step_{idx}_cmd.txt"
+                    stdin_ctx = (
+                        stdin_source.open("rb")
+                        if stdin_source is not None
+                        else contextlib.nullcontext()
                     )
-                except TypeError:
-                    # Fallback to storing a string representation if JSON encoding fails.
-                    response_path.write_text(str(response), encoding="utf-8")
-                path = curr_dir / f"step_{idx}_openai.txt"
-                path.write_text(output, encoding="utf-8")
-                if bucket_values:
-                    step_bucket_values = bucket_values
-                    for bucket_name, bucket_value in bucket_values.items():
-                        safe_bucket = "".join(
-                            ch if ch.isalnum() or ch in ("_", "-") else "_"
-                            for ch in str(bucket_name)
-                        )
-                        bucket_path = (
-                            curr_dir
-                            / f"step_{idx}_openai_bucket_{safe_bucket or 'bucket'}.txt"
+                    with stdin_ctx as stdin_fh, stdout_file.open("wb") as stdout_fh:
+                        stdin_arg = subprocess.PIPE if stdin_fh is None else stdin_fh
+                        if step_plan.cmd_argv is not None:
+                            # Python-opened descriptors are non-inheritable, so
+                            # close_fds=False is safe and allows posix_spawn.
+                            proc = subprocess.Popen(
+                                step_plan.cmd_argv,
+                                stdin=stdin_arg,
+                                stdout=stdout_fh,
+                                stderr=subprocess.PIPE,
+                                close_fds=False,
+                            )
+                        else:
+                            proc = subprocess.Popen(
+                                step_plan.cmd,
+                                stdin=stdin_arg,
+                                stdout=stdout_fh,
+                                stderr=subprocess.PIPE,
+                                shell=True,
+                            )
+                        if proc.stdin is None:
+                            _, stderr_bytes = proc.communicate()
+                        else:
+                            _grow_pipe(proc.stdin.fileno(), len(stdin_bytes))
+                            _, stderr_bytes = proc.communicate(stdin_bytes)
+                    if proc.returncode:
+                        # Name the command as configured, not the resolved argv.
+                        raise subprocess.CalledProcessError(
+                            proc.returncode,
+                            step_plan.cmd,
+                            stderr=stderr_bytes.decode("utf-8", errors="replace"),
                         )
-                        bucket_path.write_text(bucket_value, encoding="utf-8")
-            elif "cmd" in step:
-                stdin_file = step.get("stdin_file")
-                if stdin_file:
-                    stdin_path = Path(stdin_file)
-                    stdin_content = stdin_path.read_text(encoding="utf-8")
-                    if step_input:
-                        step_input = "\n".join([step_input, stdin_content])
+                    output_encoded = stdout_file.read_bytes()
+                    output = output_encoded.decode("utf-8")
+                    if "\r" in output:
+                        # Match the newline translation of a text-mode read; the
+                        # raw bytes then no longer mirror ``output``.
+                        output = output.replace("\r\n", "\n").replace("\r", "\n")
+                        output_encoded = None
                     else:
-                        step_input = stdin_content
-                completed = subprocess.run(
-                    step["cmd"],
-                    input=step_input,
-                    capture_output=True,
-                    text=True,
-                    shell=True,
-                    check=True,
-                )
-                output = completed.stdout
-                stdout_file = curr_dir / f"step_{idx}_cmd.txt"
-                stdout_file.write_text(output, encoding="utf-8")
-                path = None
-            else:
-                raise ValueError(f"Unknown step type: {step_type}")
-        except Exception as e:
-            called_process_error: Optional[subprocess.CalledProcessError] = None
-            if isinstance(e, subprocess.CalledProcessError):
-                called_process_error = e
-            else:
-                cause = getattr(e, "__cause__", None)
-                if isinstance(cause, subprocess.CalledProcessError):
-                    called_process_error = cause
-
-            stderr_text: Optional[str] = None
-            exit_code: Optional[int] = None
-
-            if called_process_error is not None:
-                exit_code = called_process_error.returncode
-                if called_process_error.stderr:
-                    stderr_text = str(called_process_error.stderr)
-            else:
-                exit_code = getattr(e, "returncode", None)
-                stderr_attr = getattr(e, "stderr", None)
-                if stderr_attr:
-                    stderr_text = str(stderr_attr)
-
-            stderr_to_log = stderr_text
-            if not stderr_to_log and isinstance(e, subprocess.CalledProcessError):
-                stderr_to_log = str(getattr(e, "stderr", "")) or None
+                        output_source = stdout_file
+                    path = None
+                else:
+                    raise ValueError(f"Unknown step type: {step_type}")
+            except Exception as e:
+                called_process_error: Optional[subprocess.CalledProcessError] = None
+                if isinstance(e, subprocess.CalledProcessError):
+                    called_process_error = e
+                else:
+                    cause = getattr(e, "__cause__", None)
+                    if isinstance(cause, subprocess.CalledProcessError):
+                        called_process_error = cause
 
-            if stderr_to_log:
-                try:
-                    sys.stderr.write(stderr_to_log)
-                    if not stderr_to_log.endswith("\n"):
-                        sys.stderr.write("\n")
-                    sys.stderr.flush()
-                except Exception:
-                    pass
-            mark_failed()
-            errors_base = curr_dir / "errors"
-            errors_base.mkdir(parents=True, exist_ok=True)
-            err_dir = Path(tempfile.mkdtemp(prefix="run_", dir=errors_base))
-            error_file = err_dir / f"step_{idx}_{step_type}.txt"
-            error_file.write_text(
-                f"{type(e).__name__}: {e}\n{traceback.format_exc()}",
-                encoding="utf-8",
-            )
-            if stderr_text is not None or exit_code is not None:
-                stderr_file = err_dir / f"step_{idx}_{step_type}_stderr.txt"
-                exit_code_str = "unknown" if exit_code is None else str(exit_code)
-                stderr_content = stderr_text or ""
-                if stderr_content and not stderr_content.endswith("\n"):
-                    stderr_content += "\n"
-                stderr_file.write_text(
-                    f"exit_code: {exit_code_str}\n{stderr_content}",
-                    encoding="utf-8",
-                )
-            output = ""
-            path = error_file
-            return [(output, path, curr_dir)]
-        finally:
-            with lock:
-                step_counts[idx] -= 1
-
-        exit_on_empty_response = step.get("exit_on_empty_response") is True
-        if exit_on_empty_response and not output.strip():
-            identifier = step.get("name") or f"step_{idx}"
-            message = (
-                "Exiting flow early: "
-                f"{identifier!s} produced an empty response."
-            )
-            print(message, flush=True)
-            log_path = curr_dir / f"step_{idx}_empty_response.txt"
-            log_path.write_text(message + "\n", encoding="utf-8")
-            return [("", log_path, curr_dir)]
-
-        exit_on_response_contains = step.get("exit_on_response_contains")
-        matched_signal: Optional[str] = None
-        if isinstance(exit_on_response_contains, (str, bytes)):
-            normalized = (
-                exit_on_response_contains.decode()
-                if isinstance(exit_on_response_contains, bytes)
-                else exit_on_response_contains
-            )
-            if normalized:
-                matched_signal = normalized if normalized in output else None
-        elif exit_on_response_contains is not None:
-            try:
-                candidates = list(exit_on_response_contains)
-            except TypeError as exc:
-                raise ValueError(
-                    "exit_on_response_contains must be a string or iterable of strings"
-                ) from exc
+                stderr_text: Optional[str] = None
+                exit_code: Optional[int] = None
 
-            for candidate in candidates:
-                if isinstance(candidate, bytes):
-                    candidate_str = candidate.decode()
+                if called_process_error is not None:
+                    exit_code = called_process_error.returncode
+                    if called_process_error.stderr:
+                        stderr_text = str(called_process_error.stderr)
                 else:
-                    candidate_str = str(candidate)
-                if candidate_str and candidate_str in output:
-                    matched_signal = candidate_str
-                    break
+                    exit_code = getattr(e, "returncode", None)
+                    stderr_attr = getattr(e, "stderr", None)
+                    if stderr_attr:
+                        stderr_text = str(stderr_attr)
 
-        if matched_signal is not None:
-            identifier = step.get("name") or f"step_{idx}"
-            message = (
-                "Exiting flow early: "
-                f"{identifier!s} produced exit signal {matched_signal!r}."
-            )
-            print(message, flush=True)
-            log_path = curr_dir / f"step_{idx}_exit_signal.txt"
-            log_path.write_text(message + "\n", encoding="utf-8")
-            return [("", log_path, curr_dir)]
+                stderr_to_log = stderr_text
+                if not stderr_to_log and isinstance(e, subprocess.CalledProcessError):
+                    stderr_to_log = str(getattr(e, "stderr", "")) or None
 
-        if step.get("array"):
-            try:
-                items = json.loads(output)
-                if not isinstance(items, list):
-                    raise ValueError("Expected JSON array")
-            except Exception as e:
+                if stderr_to_log:
+                    try:
+                        sys.stderr.write(stderr_to_log)
+                        if not stderr_to_log.endswith("\n"):
+                            sys.stderr.write("\n")
+                        sys.stderr.flush()
+                    except Exception:
+                        pass
                 mark_failed()
-                errors_base = curr_dir / "errors"
-                errors_base.mkdir(parents=True, exist_ok=True)
-                err_dir = Path(tempfile.mkdtemp(prefix="run_", dir=errors_base))
-                error_file = err_dir / f"step_{idx}_array.txt"
-                error_file.write_text(
-                    f"JSON error: {e}\n{traceback.format_exc()}",
-                    encoding="utf-8",
+                err_dir = new_error_dir(curr_dir)
+                error_file = err_dir / f"step_{idx}_{step_type}.txt"
+                error_text = f"{type(e).__name__}: {e}\n"
+                # A failed command is fully described by its exit code and
+                # stderr (written below), so only other errors pay for a
+                # formatted traceback.
+                if not isinstance(e, subprocess.CalledProcessError):
+                    error_text += traceback.format_exc()
+                _write_bytes(error_file, error_text.encode("utf-8"))
+                if stderr_text is not None or exit_code is not None:
+                    stderr_file = err_dir / f"step_{idx}_{step_type}_stderr.txt"
+                    exit_code_str = "unknown" if exit_code is None else str(exit_code)
+                    stderr_content = stderr_text or ""
+                    if stderr_content and not stderr_content.endswith("\n"):
+                        stderr_content += "\n"
+                    _write_bytes(
+                        stderr_file,
+                        f"exit_code: {exit_code_str}\n{stderr_content}".encode("utf-8"),
+                    )
+                output = ""
+                path = error_file
+                return [(output, path, curr_dir)]
+            finally:
+                _adjust_step_count(step_counts, lock, idx, -1)
+
+            if step_plan.exit_on_empty_response and not output.strip():
+                message = (
+                    "Exiting flow early: "
+                    f"{step_plan.identifier!s} produced an empty response."
                 )
-                return [("", error_file, curr_dir)]
-
-            results: List[Tuple[str, Optional[Path], Path]] = []
-            threads: List[threading.Thread] = []
-            res_lock = threading.Lock()
-
-            cancelled = False
-
-            for i, item in enumerate(items):
-                branch_dir = curr_dir / f"branch_{i}"
-                branch_dir.mkdir(parents=True, exist_ok=True)
-                item_str = json.dumps(item) if not isinstance(item, str) else item
+                print(message, flush=True)
+                log_path = curr_dir / f"step_{idx}_empty_response.txt"
+                log_path.write_text(message + "\n", encoding="utf-8")
+                return [("", log_path, curr_dir)]
+
+            exit_on_response_contains = step.get("exit_on_response_contains")
+            matched_signal: Optional[str] = None
+            if isinstance(exit_on_response_contains, (str, bytes)):
+                normalized = (
+                    exit_on_response_contains.decode()
+                    if isinstance(exit_on_response_contains, bytes)
+                    else exit_on_response_contains
+                )
+                if normalized:
+                    matched_signal = normalized if normalized in output else None
+            elif exit_on_response_contains is not None:
+                try:
+                    candidates = list(exit_on_response_contains)
+                except TypeError as exc:
+                    raise ValueError(
+                        "exit_on_response_contains must be a string or iterable of strings"
+                    ) from exc
+
+                for candidate in candidates:
+                    if isinstance(candidate, bytes):
+                        candidate_str = candidate.decode()
+                    else:
+                        candidate_str = str(candidate)
+                    if candidate_str and candidate_str in output:
+                        matched_signal = candidate_str
+                        break
+
+            if matched_signal is not None:
+                message = (
+                    "Exiting flow early: "
+                    f"{step_plan.identifier!s} produced exit signal {matched_signal!r}."
+                )
+                print(message, flush=True)
+                log_path = curr_dir / f"step_{idx}_exit_signal.txt"
+                log_path.write_text(message + "\n", encoding="utf-8")
+                return [("", log_path, curr_dir)]
 
-                def worker(s=item_str, bdir=branch_dir):
-                    nonlocal cancelled
-                    if cancel_event and cancel_event.is_set():
-                        cancelled = True
-                        mark_failed()
-                        return
-                    try:
+            if step_plan.is_array:
+                try:
+                    items = _branch_inputs(
+                        output_encoded if output_encoded is not None else output
+                    )
+                except Exception as e:
+                    mark_failed()
+                    err_dir = new_error_dir(curr_dir)
+                    error_file = err_dir / f"step_{idx}_array.txt"
+                    # The message says what was wrong with the output; a traceback
+                    # through json.loads adds nothing.
+                    _write_bytes(error_file, f"JSON error: {e}\n".encode("utf-8"))
+                    return [("", error_file, curr_dir)]
+
+                branch_runs: List[Callable[[], List[Tuple[str, Optional[Path], Path]]]] = []
+                for i, item_str in enumerate(items):
+                    branch_dir = curr_dir / f"branch_{i}"
+
+                    def run_branch(s=item_str, bdir=branch_dir):
+                        if is_cancelled():
+                            raise FlowCancelled()
+                        # Created only once the branch really starts, so a
+                        # branch cancelled while queued leaves no empty dir.
+                        bdir.mkdir(parents=True, exist_ok=True)
                         next_outputs = with_recorded_output(
                             outputs, step, idx, s, buckets=step_bucket_values
                         )
-                        branch_res = run_from(idx + 1, s, None, bdir, next_outputs)
-                    except FlowCancelled:
-                        cancelled = True
-                        mark_failed()
-                        return
-                    with res_lock:
-                        results.extend(branch_res)
+                        return run_from(idx + 1, s, None, bdir, next_outputs)
 
-                t = threading.Thread(target=worker)
-                t.start()
-                threads.append(t)
+                    branch_runs.append(run_branch)
 
-            for t in threads:
-                t.join()
+                if branch_executor is not None:
+                    branch_futures = _run_branches(branch_executor, branch_runs)
+                else:
+                    with concurrent.futures.ThreadPoolExecutor(
+                        max_workers=max(1, len(branch_runs))
+                    ) as local_executor:
+                        branch_futures = _run_branches(local_executor, branch_runs)
+
+                results: List[Tuple[str, Optional[Path], Path]] = []
+                cancelled = False
+                for future in branch_futures:
+                    exc = future.exception()
+                    if exc is None:
+                        results.extend(future.result())
+                        continue
+                    mark_failed()
+                    if isinstance(exc, FlowCancelled):
+                        cancelled = True
+                    else:
+                        traceback.print_exception(exc)
 
-            if cancelled:
-                raise FlowCancelled()
+                if cancelled:
+                    raise FlowCancelled()
 
-            return results
+                return results
 
-        next_outputs = with_recorded_output(
-            outputs, step, idx, output, buckets=step_bucket_values
-        )
-        return run_from(idx + 1, output, path, curr_dir, next_outputs)
+            outputs = with_recorded_output(
+                outputs, step, idx, output, buckets=step_bucket_values
+            )
+            idx += 1
+            prev_output, prev_path, prev_encoded = output, path, output_encoded
+            prev_source = output_source
 
     try:
         results = run_from(0, "", None, flow_dir, {})
     except FlowCancelled:
         mark_failed()
         failure_marker = flow_dir / "flow_failed.txt"
-        failure_marker.write_text("Flow failed", encoding="utf-8")
+        _write_bytes(failure_marker, b"Flow failed")
         raise
     if flow_failed:
         failure_marker = flow_dir / "flow_failed.txt"
-        failure_marker.write_text("Flow failed", encoding="utf-8")
+        _write_bytes(failure_marker, b"Flow failed")
     return results, flow_failed
 
 
-def _generate_flow_configs(
+class FlowConfigStream:
+    """Lazily expanded flow configurations with a known length.
+
+    Iterating yields :class:`FlowConfig` objects one at a time, so only the
+    flows currently being scheduled are held in memory. ``len()`` reports the
+    number of flows without expanding them.
+    """
+
+    def __init__(self, total: int, factory: Callable[[], Iterator[FlowConfig]]) -> None:
+        self._total = total
+        self._factory = factory
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __iter__(self) -> Iterator[FlowConfig]:
+        return self._factory()
+
+
+class FlowResults(Sequence):
+    """Branch results of an orchestration stored as three parallel columns.
+
+    ``outputs``, ``paths`` and ``dirs`` hold each branch's final message, the
+    file holding it (when produced by a codex step) and the branch directory.
+    Indexing and iteration yield ``(output, path, dir)`` tuples built on
+    demand, so the object still behaves like the list of tuples
+    :func:`orchestrate` used to return.
+
+    :meth:`extend` is safe to call from several threads; it keeps the columns
+    aligned under a private lock held only for three list extends.
+    """
+
+    def __init__(self) -> None:
+        self.outputs: List[str] = []
+        self.paths: List[Optional[Path]] = []
+        self.dirs: List[Path] = []
+        self._lock = threading.Lock()
+
+    def extend(self, branch_results: Iterable[Tuple[str, Optional[Path], Path]]) -> None:
+        columns = tuple(zip(*branch_results))
+        if not columns:
+            return
+        outputs, paths, dirs = columns
+        with self._lock:
+            self.outputs.extend(outputs)
+            self.paths.extend(paths)
+            self.dirs.extend(dirs)
+
+    def __len__(self) -> int:
+        return len(self.outputs)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return list(zip(self.outputs[index], self.paths[index], self.dirs[index]))
+        return (self.outputs[index], self.paths[index], self.dirs[index])
+
+    def __iter__(self) -> Iterator[Tuple[str, Optional[Path], Path]]:
+        return zip(self.outputs, self.paths, self.dirs)
+
+
+def _flow_resume_key(
+    flow_conf: List[Dict[str, Any]],
+    workdir: Path,
+    openai_request_options: Optional[Dict[str, Optional[str]]],
+) -> str:
+    canonical = json.dumps(flow_conf, sort_keys=True, default=str)
+    return ResponseCache.key(
+        "flow",
+        canonical,
+        workdir=str(workdir),
+        openai_request_options=json.dumps(openai_request_options, sort_keys=True),
+    )
+
+
+def _parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an ``i/N`` shard specification into ``(i, N)``."""
+    try:
+        index_str, count_str = value.split("/", 1)
+        index, count = int(index_str), int(count_str)
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {value!r}") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must satisfy 0 <= i < N, got {value!r}")
+    return index, count
+
+
+def _stream_flow_configs(
     base_config: List[Dict[str, Any]],
     key_files: Dict[str, Path],
     append_filepath: bool = False,
-) -> List[FlowConfig]:
-    """Expand a base configuration into multiple flows via placeholder files.
+    shard: Optional[Tuple[int, int]] = None,
+) -> FlowConfigStream:
+    """Expand a base configuration into flows lazily.
 
-    Placeholders in prompts must be wrapped with triple braces, e.g. ``{{{name}}}``.
-    When ``append_filepath`` is ``True``, the path to each interpolated file is
-    appended after its contents in the prompt. Steps may also reference manifests
-    of newline-delimited file paths via ``stdin_file``; when present, a flow is
-    emitted for every combination of manifest entries and placeholder values.
+    Key and manifest files are read up front, but the Cartesian product of
+    their entries is only expanded while the returned stream is iterated. See
+    :func:`_generate_flow_configs` for the placeholder semantics.
+
+    ``shard=(i, n)`` keeps only every ``n``-th combination starting at ``i``,
+    so ``n`` hosts given shards ``0..n-1`` run disjoint slices that together
+    cover every flow. Skipped combinations are never interpolated.
+
+    Steps that no placeholder or manifest entry can change are built once and
+    the same dict appears in every yielded flow, so callers must treat the
+    steps as read-only. :func:`_generate_flow_configs` returns private copies.
+
+    Raises:
+        ValueError: If a key's file list has no entries, since no flow could
+            be generated. This is checked before any listed file is read.
+        OSError: If a ``prmpt_file`` without placeholders cannot be read.
+            Like key files, these are read before the stream is returned.
     """
 
     loaded: Dict[str, List[Tuple[str, str]]] = {}
 
     if key_files:
+        key_paths: Dict[str, List[str]] = {}
         for key, file_path in key_files.items():
             with file_path.open("r", encoding="utf-8") as f:
-                paths = [line.strip() for line in f.readlines() if line.strip()]
-            entries: List[Tuple[str, str]] = []
-            for p in paths:
-                text = Path(p).read_text(encoding="utf-8")
-                if append_filepath:
-                    text = text.rstrip("\n") + f"\n{p}"
-                entries.append((p, text))
-            loaded[key] = entries
+                paths = [entry for entry in map(str.strip, f) if entry]
+            if not paths:
+                # The product would be empty; fail before reading any of the
+                # other keys' files.
+                raise ValueError(f"Key {key!r} file list {file_path} is empty")
+            key_paths[key] = paths
+        # A path listed more than once, in one key or across keys, maps to a
+        # single shared entry rather than a fresh copy of its (suffixed) text.
+        unique_paths = list(dict.fromkeys(itertools.chain.from_iterable(key_paths.values())))
+        shared_entries: Dict[str, Tuple[str, str]] = {}
+        for p, text in zip(unique_paths, _read_texts(unique_paths)):
+            if append_filepath:
+                text = text.rstrip("\n") + f"\n{p}"
+            shared_entries[p] = (p, text)
+        for key, paths in key_paths.items():
+            loaded[key] = [shared_entries[p] for p in paths]
 
     keys = list(loaded.keys())
-    key_values_product: Iterable[Tuple[Tuple[str, str], ...]]
-    if keys:
-        key_values_product = list(itertools.product(*(loaded[k] for k in keys)))
-    else:
-        key_values_product = [tuple()]
 
     manifest_steps: List[Tuple[int, List[str]]] = []
     for idx, step in enumerate(base_config):
         stdin_file = step.get("stdin_file")
         if not stdin_file:
             continue
-        stdin_path = Path(stdin_file)
-        if not stdin_path.exists():
+        # Read through the shared cache, so several steps naming the same
+        # manifest (or a manifest that is also a key file) read it once.
+        try:
+            manifest_text = _read_text(stdin_file)
+        except FileNotFoundError:
             continue
         manifest_candidates = [
-            line.strip()
-            for line in stdin_path.read_text(encoding="utf-8").splitlines()
-            if line.strip()
+            line for line in map(str.strip, manifest_text.splitlines()) if line
         ]
         if not manifest_candidates:
             continue
-        if all(Path(candidate).exists() for candidate in manifest_candidates):
+        if all(map(os.path.exists, manifest_candidates)):
             manifest_steps.append((idx, manifest_candidates))
 
     manifest_indexes = {idx: pos for pos, (idx, _) in enumerate(manifest_steps)}
-    manifest_values_product: Iterable[Tuple[str, ...]]
-    if manifest_steps:
-        manifest_values_product = list(
-            itertools.product(*(paths for _, paths in manifest_steps))
-        )
-    else:
-        manifest_values_product = [tuple()]
 
-    flow_configs: List[FlowConfig] = []
+    total = math.prod(len(loaded[k]) for k in keys) * math.prod(
+        len(paths) for _, paths in manifest_steps
+    )
+    shard_start, shard_step = shard if shard is not None else (0, 1)
+    total = len(range(shard_start, total, shard_step))
+
+    # One alternation matches every placeholder. Its capturing group makes
+    # ``split`` return literals at even positions and placeholders at odd ones.
+    placeholders = ["{{{" + key + "}}}" for key in keys]
+    pattern = (
+        re.compile("(" + "|".join(re.escape(p) for p in placeholders) + ")")
+        if placeholders
+        else None
+    )
 
-    for key_combo in key_values_product:
-        mapping: Dict[str, str] = {}
-        combo_paths: List[str] = []
-        for key, (path_str, value) in zip(keys, key_combo):
-            mapping[key] = value
-            combo_paths.append(path_str)
+    def templated(text: Optional[str]) -> bool:
+        return bool(pattern is not None and text and pattern.search(text))
+
+    def segments(text: Optional[str]) -> Optional[List[str]]:
+        # ``None`` marks text without placeholders, which is reused verbatim.
+        if not templated(text):
+            return None
+        assert pattern is not None and text is not None
+        return pattern.split(text)
+
+    # Base prompts and commands are split once, so each flow only splices its
+    # values into the gaps instead of rescanning the string.
+    step_plan = [
+        (
+            step,
+            step.get("prompt", ""),
+            segments(step.get("prompt", "")),
+            step.get("cmd"),
+            segments(step.get("cmd")),
+            step.get("prmpt_file"),
+            manifest_indexes.get(step_idx),
+        )
+        for step_idx, step in enumerate(base_config)
+    ]
+
+    # A prmpt_file path without placeholders names the same file in every
+    # flow, so it is read (and checked for placeholders) once. Reading it here
+    # rather than in ``expand`` makes a missing file fail before any flow runs.
+    static_file_prompts: Dict[int, Tuple[str, Optional[List[str]]]] = {}
+    for step_idx, (_, _, _, _, _, base_prmpt_file, _) in enumerate(step_plan):
+        if base_prmpt_file is not None and not templated(base_prmpt_file):
+            text = _read_text(base_prmpt_file)
+            static_file_prompts[step_idx] = (text, segments(text))
+
+    def expand() -> Iterator[FlowConfig]:
+        # Steps that nothing in a combination can change are built once and
+        # the same dict is shared by every flow; flows only read their steps.
+        shared_steps: Dict[int, Dict[str, Any]] = {}
+        for step_idx, (
+            step,
+            base_prompt,
+            prompt_segments,
+            _,
+            cmd_segments,
+            base_prmpt_file,
+            manifest_pos,
+        ) in enumerate(step_plan):
+            if cmd_segments is not None or manifest_pos is not None:
+                continue
+            if step_idx in static_file_prompts:
+                file_prompt, file_segments = static_file_prompts[step_idx]
+                if file_segments is None:
+                    shared_steps[step_idx] = dict(step, prompt=file_prompt)
+            elif base_prmpt_file is None and prompt_segments is None:
+                shared_steps[step_idx] = dict(step, prompt=base_prompt)
+
+        # One product over keys and manifests enumerates combinations in the
+        # same order as nesting manifests inside keys, and lets a shard be
+        # taken with islice.
+        combos = itertools.product(
+            *(loaded[k] for k in keys), *(paths for _, paths in manifest_steps)
+        )
+        if shard_step > 1 or shard_start:
+            combos = itertools.islice(combos, shard_start, None, shard_step)
+        for combo in combos:
+            key_combo = combo[: len(keys)]
+            manifest_paths = list(combo[len(keys) :])
+            lookup = {
+                placeholder: value
+                for placeholder, (_, value) in zip(placeholders, key_combo)
+            }
+            combo_paths = [path_str for path_str, _ in key_combo]
+
+            def interpolate(text: str) -> str:
+                if pattern is None or not text:
+                    return text
+                return pattern.sub(lambda m: lookup[m.group(0)], text)
+
+            def splice(parts: List[str]) -> str:
+                filled = parts.copy()
+                for pos in range(1, len(filled), 2):
+                    filled[pos] = lookup[filled[pos]]
+                return "".join(filled)
 
-        for manifest_combo in manifest_values_product:
-            manifest_paths = list(manifest_combo)
             flow: List[Dict[str, Any]] = []
-            for step_idx, step in enumerate(base_config):
+            for step_idx, (
+                step,
+                base_prompt,
+                prompt_segments,
+                _,
+                cmd_segments,
+                base_prmpt_file,
+                manifest_pos,
+            ) in enumerate(step_plan):
+                shared_step = shared_steps.get(step_idx)
+                if shared_step is not None:
+                    flow.append(shared_step)
+                    continue
                 new_step = dict(step)
-                prompt = new_step.get("prompt", "")
-                cmd_str = new_step.get("cmd")
-                prmpt_file = new_step.get("prmpt_file")
-                for key, value in mapping.items():
-                    placeholder = "{{{" + key + "}}}"
-                    prompt = prompt.replace(placeholder, value)
-                    if cmd_str is not None:
-                        cmd_str = cmd_str.replace(placeholder, value)
-                    if prmpt_file is not None:
-                        prmpt_file = prmpt_file.replace(placeholder, value)
-                if prmpt_file is not None:
-                    prompt = Path(prmpt_file).read_text(encoding="utf-8")
-                    for key, value in mapping.items():
-                        placeholder = "{{{" + key + "}}}"
-                        prompt = prompt.replace(placeholder, value)
+                if step_idx in static_file_prompts:
+                    file_prompt, file_segments = static_file_prompts[step_idx]
+                    prompt = splice(file_segments) if file_segments else file_prompt
+                elif base_prmpt_file is not None:
+                    prmpt_file = interpolate(base_prmpt_file)
+                    prompt = interpolate(_read_text(prmpt_file))
                     new_step["prmpt_file"] = prmpt_file
-                manifest_pos = manifest_indexes.get(step_idx)
+                elif prompt_segments is not None:
+                    prompt = splice(prompt_segments)
+                else:
+                    prompt = base_prompt
                 if manifest_pos is not None:
                     new_step["stdin_file"] = manifest_paths[manifest_pos]
                 new_step["prompt"] = prompt
-                if cmd_str is not None:
-                    new_step["cmd"] = cmd_str
+                if cmd_segments is not None:
+                    new_step["cmd"] = splice(cmd_segments)
                 flow.append(new_step)
             interpolated_paths = combo_paths + manifest_paths
-            flow_configs.append(FlowConfig(flow, interpolated_paths))
+            yield FlowConfig(flow, interpolated_paths)
 
-    return flow_configs
+    return FlowConfigStream(total, expand)
+
+
+def _generate_flow_configs(
+    base_config: List[Dict[str, Any]],
+    key_files: Dict[str, Path],
+    append_filepath: bool = False,
+) -> List[FlowConfig]:
+    """Expand a base configuration into multiple flows via placeholder files.
+
+    Placeholders in prompts must be wrapped with triple braces, e.g. ``{{{name}}}``.
+    When ``append_filepath`` is ``True``, the path to each interpolated file is
+    appended after its contents in the prompt. Steps may also reference manifests
+    of newline-delimited file paths via ``stdin_file``; when present, a flow is
+    emitted for every combination of manifest entries and placeholder values.
+
+    Unlike :func:`_stream_flow_configs`, every flow owns its step dicts, so
+    callers may edit one flow without affecting the others.
+    """
+    return [
+        FlowConfig(map(dict, flow), flow.interpolated_paths)
+        for flow in _stream_flow_configs(base_config, key_files, append_filepath)
+    ]
 
 
 def orchestrate(
     base_config: List[Dict[str, Any]],
-    flow_configs: List[List[Dict[str, Any]]],
+    flow_configs: Iterable[List[Dict[str, Any]]],
     parallel: int = 1,
     workdir: Path = Path("."),
     codex_timeout: Optional[int] = None,
@@ -592,19 +1421,32 @@ def orchestrate(
     halt_on_max_failures: bool = True,
     max_flows: Optional[int] = None,
     openai_request_options: Optional[Dict[str, Optional[str]]] = None,
-) -> List[Tuple[str, Optional[Path], Path]]:
+    total: Optional[int] = None,
+    branch_parallel: Optional[int] = None,
+    response_cache: Optional[ResponseCache] = None,
+    openai_batch_window: float = 5.0,
+    max_codex_parallel: Optional[int] = None,
+    resume_cache: Optional[ResponseCache] = None,
+    save_openai_responses: bool = True,
+    keep_codex_artifacts: bool = True,
+) -> FlowResults:
     """Execute multiple flows with a concurrency cap while logging active counts.
 
-    Returns a list of tuples containing each branch's final message, the path to
-    the file holding that message when produced by a codex step, and the branch's
-    output directory. Steps may define ``{"array": true}`` to branch a flow based
-    on a JSON array output. Each step may optionally define a ``name`` field,
-    which is used in the live progress output instead of the underlying step
-    ``type``.
+    Flows are dominated by subprocess and network waits rather than Python
+    work; see ``docs/performance.md`` before optimizing this loop.
+
+    Returns a :class:`FlowResults` sequence of tuples containing each branch's
+    final message, the path to the file holding that message when produced by a
+    codex step, and the branch's output directory. Steps may define
+    ``{"array": true}`` to branch a flow based on a JSON array output. Each step
+    may optionally define a ``name`` field, which is used in the live progress
+    output instead of the underlying step ``type``.
 
     Args:
         base_config: The original configuration defining step types and prompts.
-        flow_configs: Expanded configurations for each flow.
+        flow_configs: Expanded configurations for each flow. Any iterable is
+            accepted and consumed lazily, one flow per free slot, so a
+            :class:`FlowConfigStream` never expands flows that are not run.
         parallel: Maximum number of flows to run concurrently.
         workdir: Directory to run codex commands from.
         codex_timeout: Optional timeout in seconds for codex CLI invocations.
@@ -626,6 +1468,32 @@ def orchestrate(
         openai_request_options: Optional overrides for OpenAI steps, such as
             ``model``, ``service_tier``, and ``reasoning_effort``. When not
             provided, defaults built into :func:`call_openai_api` are used.
+        total: Number of flows shown in the progress display. Defaults to
+            ``len(flow_configs)`` when the iterable has a length; otherwise
+            progress is shown as ``finished/?``.
+        branch_parallel: Size of the thread pool shared by array branches
+            across all flows. Defaults to ``max(32, parallel * 4)``. Threads
+            waiting on their branches also run queued branch work, so nested
+            arrays never deadlock the pool.
+        response_cache: Optional :class:`ResponseCache` shared by every flow,
+            so identical OpenAI requests are only sent once.
+        openai_batch_window: Seconds a ``"batchable": true`` OpenAI step waits
+            for other flows to reach it before their prompts are submitted
+            together as one Batch API job.
+        max_codex_parallel: Optional cap on concurrent codex CLI processes
+            across all flows and branches, independent of ``parallel``. Lets a
+            high ``parallel`` serve I/O-bound OpenAI steps without
+            oversubscribing the CPU with codex runs.
+        resume_cache: Optional :class:`ResponseCache` recording the results of
+            successful flows, keyed by their configuration. Flows found in it
+            are reported as done with their earlier results instead of being
+            run again, so an interrupted orchestration can be resumed.
+        save_openai_responses: When ``False``, OpenAI steps skip writing their
+            full ``step_{idx}_openai_response.json``; the step text and bucket
+            files are still written.
+        keep_codex_artifacts: When ``False``, codex steps run in RAM-backed
+            scratch space and only ``final_message.txt`` is kept in the flow
+            directory; ``stdout.txt`` and ``time.txt`` are discarded.
 
     Raises:
         MaxFlowFailuresExceeded: When the number of failed flows reaches the
@@ -640,14 +1508,38 @@ def orchestrate(
     if max_flows is not None and max_flows < 0:
         raise ValueError("max_flows must be non-negative")
 
+    if branch_parallel is None:
+        branch_parallel = max(32, parallel * 4)
+    elif branch_parallel < 1:
+        raise ValueError("branch_parallel must be at least 1")
+
+    codex_slots: Optional[threading.Semaphore] = None
+    if max_codex_parallel is not None:
+        if max_codex_parallel < 1:
+            raise ValueError("max_codex_parallel must be at least 1")
+        codex_slots = threading.BoundedSemaphore(max_codex_parallel)
+
     step_names = [step.get("name") or step.get("type", "") for step in base_config]
+    openai_batcher: Optional[OpenAIStepBatcher] = None
+    if any(step.get("batchable") is True for step in base_config):
+        openai_batcher = OpenAIStepBatcher(openai_batch_window)
     final_step_is_codex = bool(base_config) and base_config[-1].get("type") == "codex"
-    step_counts = [0] * len(base_config)
-    step_lock = threading.Lock()
+    collect_final_paths = list_codex_final_paths and final_step_is_codex
+    # Set whenever step counts or the finished total change so the progress
+    # display only redraws when there is something new to show.
+    progress_event = threading.Event()
+    step_counts = StepCounts(len(base_config), on_change=progress_event.set)
     progress_lock = threading.Lock()
-    results: List[Tuple[str, Optional[Path], Path]] = []
+    results = FlowResults()
     finished = 0
-    total = len(flow_configs) if max_flows is None else min(len(flow_configs), max_flows)
+    if total is None:
+        try:
+            total = len(flow_configs)  # type: ignore[arg-type]
+        except TypeError:
+            total = None
+    if total is not None and max_flows is not None:
+        total = min(total, max_flows)
+    total_display = "?" if total is None else str(total)
     failed_flows = 0
     cancel_event = threading.Event()
     cancel_message_printed = False
@@ -663,35 +1555,56 @@ def orchestrate(
             branch_results, flow_failed = _run_flow(
                 flow_conf,
                 step_counts,
-                step_lock,
+                None,
                 workdir,
                 flow_dir,
                 codex_timeout=codex_timeout,
                 cancel_event=cancel_event,
                 openai_request_options=openai_request_options,
+                branch_executor=branch_executor,
+                response_cache=response_cache,
+                openai_batcher=openai_batcher,
+                codex_slots=codex_slots,
+                save_openai_responses=save_openai_responses,
+                keep_codex_artifacts=keep_codex_artifacts,
             )
         except FlowCancelled:
             record_finished("failed", interpolated_paths)
             with progress_lock:
                 finished += 1
+            progress_event.set()
             return
 
+        if resume_cache is not None and not flow_failed:
+            resume_cache.put(
+                _flow_resume_key(flow_conf, workdir, openai_request_options),
+                [
+                    [output, None if path is None else str(path), str(branch_dir)]
+                    for output, path, branch_dir in branch_results
+                ],
+            )
+        complete_flow(branch_results, flow_failed, interpolated_paths)
+
+    def complete_flow(
+        branch_results: List[Tuple[str, Optional[Path], Path]],
+        flow_failed: bool,
+        interpolated_paths: Tuple[str, ...],
+    ) -> None:
+        nonlocal finished, failed_flows, cancel_message_printed
         status = "failed" if flow_failed else "done"
         success_paths: List[Path] = []
-        if (
-            list_codex_final_paths
-            and final_step_is_codex
-            and not flow_failed
-        ):
+        if collect_final_paths and not flow_failed:
             success_paths = [
                 path
                 for _, path, _ in branch_results
                 if path is not None and path.name == "final_message.txt"
             ]
 
+        # Results carry their own lock, so the shared progress lock only
+        # covers the counters below.
+        results.extend(branch_results)
         trigger_message = False
         with progress_lock:
-            results.extend(branch_results)
             finished += 1
             if flow_failed:
                 failed_flows += 1
@@ -703,13 +1616,10 @@ def orchestrate(
                         cancel_message_printed = True
                         trigger_message = True
 
+        progress_event.set()
         record_finished(status, interpolated_paths)
         for path in success_paths:
-            try:
-                print(path.resolve(), flush=True)
-            except FileNotFoundError:
-                # If the file was removed before printing, skip emitting it.
-                continue
+            print(absolute_path(path), flush=True)
 
         if trigger_message:
             print("Maximum flow failures reached", flush=True)
@@ -728,85 +1638,152 @@ def orchestrate(
             padding = " " * (last_display_width - len(display))
 
         end = "\n" if final else "\r"
-        print(display + padding, end=end, flush=True)
+        stream = sys.stdout
+        buffer = getattr(stream, "buffer", None)
+        if buffer is None:
+            print(display + padding, end=end, flush=True)
+        else:
+            # Each redraw goes out as one pre-encoded write on the binary
+            # layer. Flushing the text layer first keeps earlier ``print``
+            # output (flow paths) ahead of the progress line.
+            data = (display + padding + end).encode(
+                stream.encoding or "utf-8", errors="replace"
+            )
+            stream.flush()
+            buffer.write(data)
+            buffer.flush()
 
         last_display = display
         last_display_width = len(display)
 
-    def monitor():
-        nonlocal last_display
-        while not stop_event.is_set():
-            with step_lock:
-                parts = [f"{name}: {count}" for name, count in zip(step_names, step_counts)]
-            with progress_lock:
-                prog = f"{finished}/{total}"
-            display = " -> ".join(parts)
-            if display:
-                display += f" | {prog}"
-            else:
-                display = prog
-            emit_progress(display)
-            time.sleep(0.5)
-        with step_lock:
-            parts = [f"{name}: {count}" for name, count in zip(step_names, step_counts)]
+    # The display layout never changes during a run, so it is rendered into a
+    # single format string once; each redraw is one ``format`` call.
+    escaped_names = [name.replace("{", "{{").replace("}", "}}") for name in step_names]
+    progress_template = " -> ".join(f"{name}: {{}}" for name in escaped_names)
+    if progress_template:
+        progress_template += " | "
+    progress_template += "{}/" + total_display
+
+    last_progress_key: Optional[Tuple[Tuple[int, ...], int]] = None
+
+    def render_progress(*, final: bool = False) -> None:
+        nonlocal last_progress_key
+        counts = tuple(step_counts.snapshot())
         with progress_lock:
-            prog = f"{finished}/{total}"
-        display = " -> ".join(parts)
-        if display:
-            display += f" | {prog}"
-        else:
-            display = prog
-        emit_progress(display, final=True)
-        
-    run_dir = Path(tempfile.mkdtemp(prefix="run_", dir=GENERATED_DIR))
+            done = finished
+        # Wake-ups that leave the counters unchanged (for example a flow
+        # moving between two steps and back) skip formatting entirely.
+        key = (counts, done)
+        if final or key != last_progress_key:
+            last_progress_key = key
+            emit_progress(progress_template.format(*counts, done), final=final)
+        flush_finished()
+
+    def monitor():
+        # Redraw only when a worker reports a change, and at most every
+        # 100ms so bursts of updates do not thrash the terminal.
+        while True:
+            progress_event.wait()
+            if stop_event.is_set():
+                break
+            progress_event.clear()
+            render_progress()
+            stop_event.wait(0.1)
+        render_progress(final=True)
+
+    run_dir = Path(tempfile.mkdtemp(prefix="run_", dir=ensure_dir(GENERATED_DIR)))
+    # Resolved once; paths printed for flows are joined onto it rather than
+    # each paying for a symlink walk of every component.
+    run_dir_abs = run_dir.resolve()
+
+    def absolute_path(path: Path) -> Path:
+        try:
+            return run_dir_abs / path.relative_to(run_dir)
+        except ValueError:
+            # Results restored by --resume may live in an earlier run.
+            return path.resolve()
 
     finished_file = run_dir / "finished.txt"
-    finished_file.write_text("", encoding="utf-8")
+    # A single buffered handle serves the whole run; the monitor flushes it
+    # whenever it redraws progress (which every completion triggers) instead
+    # of the file being reopened for every flow.
+    finished_fh = finished_file.open("w", encoding="utf-8", buffering=8192)
     finished_lock = threading.Lock()
 
     def record_finished(status: str, interpolated_paths: Tuple[str, ...]) -> None:
         parts = ", ".join(interpolated_paths)
         line = status if not parts else f"{status} {parts}"
         with finished_lock:
-            with finished_file.open("a", encoding="utf-8") as fh:
-                fh.write(line + "\n")
+            finished_fh.write(line + "\n")
+
+    def flush_finished() -> None:
+        with finished_lock:
+            finished_fh.flush()
 
-    threads: List[threading.Thread] = []
+    progress_event.set()
     monitor_thread = threading.Thread(target=monitor)
     monitor_thread.start()
 
-    for idx, flow_conf in enumerate(flow_configs):
-        if max_flows is not None and idx >= max_flows:
-            break
-        if cancel_event.is_set():
-            break
-        flow_dir = Path(tempfile.mkdtemp(prefix="flow_", dir=run_dir))
-        if print_flow_paths:
-            print(flow_dir.resolve())
-        interpolated_paths = getattr(flow_conf, "interpolated_paths", tuple())
-        while True:
-            if cancel_event.is_set():
-                break
-            with progress_lock:
-                active = len([t for t in threads if t.is_alive()])
-            if active < parallel:
-                t = threading.Thread(
-                    target=worker,
-                    args=(flow_conf, flow_dir, tuple(interpolated_paths)),
+    try:
+        # The semaphore bounds how many flows have been handed to the pool, so
+        # flow directories are still created (and printed) only when a worker
+        # is about to pick the flow up, and cancellation stops scheduling
+        # immediately.
+        slots = threading.BoundedSemaphore(parallel)
+        flow_counter = itertools.count()
+        futures: List[concurrent.futures.Future] = []
+
+        def release_slot(future: concurrent.futures.Future) -> None:
+            slots.release()
+            exc = future.exception()
+            if exc is not None:
+                traceback.print_exception(exc)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=parallel, thread_name_prefix="flow"
+        ) as executor, concurrent.futures.ThreadPoolExecutor(
+            max_workers=branch_parallel, thread_name_prefix="branch"
+        ) as branch_executor:
+            is_cancelled = cancel_event.is_set
+            for idx, flow_conf in enumerate(flow_configs):
+                if max_flows is not None and idx >= max_flows:
+                    break
+                if is_cancelled():
+                    break
+                interpolated_paths = tuple(
+                    getattr(flow_conf, "interpolated_paths", tuple())
                 )
-                threads.append(t)
-                t.start()
-                break
-            time.sleep(0.1)
-
-        if cancel_event.is_set():
-            break
-
-    for t in threads:
-        t.join()
-
-    stop_event.set()
-    monitor_thread.join()
+                if resume_cache is not None:
+                    previous = resume_cache.get(
+                        _flow_resume_key(flow_conf, workdir, openai_request_options)
+                    )
+                    if previous is not None:
+                        complete_flow(
+                            [
+                                (output, None if path is None else Path(path), Path(d))
+                                for output, path, d in previous
+                            ],
+                            False,
+                            interpolated_paths,
+                        )
+                        continue
+                slots.acquire()
+                if is_cancelled():
+                    slots.release()
+                    break
+                flow_dir = _make_numbered_dir(run_dir, "flow_", flow_counter)
+                if print_flow_paths:
+                    print(run_dir_abs / flow_dir.name)
+                future = executor.submit(worker, flow_conf, flow_dir, interpolated_paths)
+                future.add_done_callback(release_slot)
+                futures.append(future)
+
+            concurrent.futures.wait(futures)
+    finally:
+        stop_event.set()
+        progress_event.set()
+        monitor_thread.join()
+        finished_fh.close()
 
     if failed_flows:
         failed_file = run_dir / "failed_files"
@@ -840,6 +1817,21 @@ if __name__ == "__main__":
         default=1,
         help="Maximum number of flows to run concurrently",
     )
+    parser.add_argument(
+        "--branch-parallel",
+        type=int,
+        default=None,
+        help=(
+            "Size of the thread pool shared by array branches across all flows "
+            "(default: max(32, 4 * --parallel))"
+        ),
+    )
+    parser.add_argument(
+        "--max-codex-parallel",
+        type=int,
+        default=None,
+        help="Maximum number of codex CLI processes running at once across all flows",
+    )
     parser.add_argument(
         "--max-flows",
         type=int,
@@ -852,6 +1844,16 @@ if __name__ == "__main__":
         default=[],
         help="Placeholder interpolation in the form name:filelist.txt (use {{{name}}} in prompts)",
     )
+    parser.add_argument(
+        "--shard",
+        type=_parse_shard,
+        default=None,
+        metavar="I/N",
+        help=(
+            "Run only every N-th flow starting at flow I (0-based), so N hosts "
+            "with shards 0/N .. N-1/N split the flows between them"
+        ),
+    )
     parser.add_argument(
         "--append-filepath",
         action="store_true",
@@ -902,11 +1904,58 @@ if __name__ == "__main__":
             "Reasoning effort level for OpenAI steps (for example, 'medium' or 'high')"
         ),
     )
+    parser.add_argument(
+        "--response-cache",
+        nargs="?",
+        const=str(GENERATED_DIR / "llm_cache"),
+        default=None,
+        metavar="DIR",
+        help=(
+            "Reuse OpenAI and Codex results for identical requests, persisting them in "
+            "DIR (default: generated/llm_cache) across runs"
+        ),
+    )
+    parser.add_argument(
+        "--openai-batch-window",
+        type=float,
+        default=5.0,
+        help=(
+            "Seconds a batchable OpenAI step waits to collect prompts from other "
+            "flows before submitting them as one Batch API job"
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        nargs="?",
+        const=str(GENERATED_DIR / "flow_cache"),
+        default=None,
+        metavar="DIR",
+        help=(
+            "Record successful flows in DIR (default: generated/flow_cache) and "
+            "skip flows already recorded there by an earlier run"
+        ),
+    )
     parser.add_argument(
         "--hide-flow-paths",
         action="store_true",
         help="Suppress printing the generated flow directory paths",
     )
+    parser.add_argument(
+        "--no-response-json",
+        action="store_true",
+        help=(
+            "Do not write the full step_N_openai_response.json for OpenAI steps; "
+            "the step output and bucket files are still written"
+        ),
+    )
+    parser.add_argument(
+        "--codex-scratch",
+        action="store_true",
+        help=(
+            "Run Codex steps in scratch space (CODEX_SCRATCH, /dev/shm or the temp "
+            "directory) and keep only final_message.txt in the flow directory"
+        ),
+    )
     parser.add_argument(
         "--list-final-message-paths",
         action="store_true",
@@ -917,8 +1966,8 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
 
-    with open(args.config, "r", encoding="utf-8") as f:
-        config = json.load(f)
+    with open(args.config, "rb") as f:
+        config = _load_json(f.read())
 
     key_files = {}
     for item in args.key:
@@ -927,8 +1976,8 @@ if __name__ == "__main__":
         name, path = item.split(":", 1)
         key_files[name] = Path(path)
 
-    flow_configs = _generate_flow_configs(
-        config, key_files, append_filepath=args.append_filepath
+    flow_configs = _stream_flow_configs(
+        config, key_files, append_filepath=args.append_filepath, shard=args.shard
     )
 
     openai_request_options = {
@@ -956,6 +2005,17 @@ if __name__ == "__main__":
             halt_on_max_failures=not args.ignore_max_failures,
             max_flows=args.max_flows,
             openai_request_options=openai_request_options,
+            branch_parallel=args.branch_parallel,
+            openai_batch_window=args.openai_batch_window,
+            max_codex_parallel=args.max_codex_parallel,
+            resume_cache=ResponseCache(Path(args.resume)) if args.resume else None,
+            save_openai_responses=not args.no_response_json,
+            keep_codex_artifacts=not args.codex_scratch,
+            response_cache=(
+                ResponseCache(Path(args.response_cache))
+                if args.response_cache
+                else None
+            ),
         )
     except MaxFlowFailuresExceeded:
         sys.exit(1)
@@ -0,0 +1,144 @@
+import concurrent.futures
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from openai_utils import _json_dumps, _json_loads
+
+
+class ResponseCache:
+    """Content-addressed store for model responses.
+
+    The ``max_entries`` most recently used entries are kept in memory and, when
+    ``directory`` is given, every entry is also persisted as a ``<key>.json``
+    file so later runs (and evicted keys) can reuse them. Keys come from
+    :meth:`key`, which hashes every input that influences a response; callers
+    decide which steps are safe to cache.
+
+    :meth:`get_or_compute` also coalesces concurrent misses, so flows that
+    share a prefix of identical steps run that prefix once even when they are
+    scheduled at the same time.
+    """
+
+    def __init__(
+        self, directory: Optional[Path] = None, max_entries: Optional[int] = 1024
+    ) -> None:
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.directory = Path(directory) if directory is not None else None
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+        self._directory_ready = False
+
+    @staticmethod
+    def key(kind: str, prompt: str, **params: Any) -> str:
+        """Return a stable hex digest for a request.
+
+        Args:
+            kind: Step type, so different backends never share an entry.
+            prompt: The full prompt sent to the model.
+            **params: Remaining request options (model, web search, ...). They
+                are hashed in sorted order, so keyword order does not matter.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(kind.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        for name in sorted(params):
+            digest.update(b"\0")
+            digest.update(f"{name}={params[name]!r}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _remember(self, key: str, value: Any) -> None:
+        # Caller holds ``self._lock``.
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached entry for ``key`` or ``None`` when absent."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory is None:
+            return None
+        try:
+            value = _json_loads(self._path(key).read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+        with self._lock:
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key``.
+
+        Values that cannot be encoded as JSON are kept in memory only.
+        """
+        with self._lock:
+            self._remember(key, value)
+        if self.directory is None:
+            return
+        try:
+            data = _json_dumps(value)
+        except TypeError:
+            return
+        if not self._directory_ready:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._directory_ready = True
+        # Write to a private name and rename so concurrent readers (including
+        # other processes sharing the directory) never see a partial entry.
+        path = self._path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Return the entry for ``key``, calling ``compute`` to fill a miss.
+
+        While one caller computes a value, others asking for the same key wait
+        for its result instead of repeating the work. If that computation
+        raises, each waiter falls back to calling ``compute`` itself, so a
+        failure is never shared between flows.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = concurrent.futures.Future()
+                self._pending[key] = pending
+        assert pending is not None
+        if not owner:
+            try:
+                return pending.result()
+            except Exception:
+                return compute()
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(exc)
+            raise
+        self.put(key, value)
+        with self._lock:
+            del self._pending[key]
+        pending.set_result(value)
+        return value
@@ -1,5 +1,10 @@
+import json
+import subprocess
 import threading
 from pathlib import Path
+
+import pytest
+
 import orchestrator
 
 def test_cmd_output_saved(tmp_path):
@@ -141,3 +146,205 @@ def test_generate_flow_configs_expands_stdin_manifests(tmp_path):
         (str(key_data_two), str(data_a)),
         (str(key_data_two), str(data_b)),
     }
+
+
+def test_nested_array_branches_share_small_executor(tmp_path):
+    import concurrent.futures
+
+    config = [
+        {"type": "cmd", "cmd": "printf '[\"a\",\"b\",\"c\"]'", "array": True},
+        {"type": "cmd", "cmd": "printf '[\"1\",\"2\"]'", "array": True},
+        {"type": "cmd", "cmd": "cat"},
+    ]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        results, failed = orchestrator._run_flow(
+            config,
+            [0, 0, 0],
+            threading.Lock(),
+            tmp_path,
+            tmp_path,
+            branch_executor=executor,
+        )
+
+    assert not failed
+    assert sorted(r[0] for r in results) == ["1", "1", "1", "2", "2", "2"]
+
+
+def test_cmd_output_bytes_are_piped_to_next_cmd(tmp_path):
+    config = [
+        {"type": "cmd", "cmd": "printf 'caf\\303\\251\\r\\nx'"},
+        {"type": "cmd", "cmd": "od -An -c"},
+        {"type": "cmd", "cmd": "cat"},
+    ]
+    flow_dir = tmp_path / "flow"
+    flow_dir.mkdir()
+
+    results, failed = orchestrator._run_flow(
+        config, [0, 0, 0], threading.Lock(), tmp_path, flow_dir
+    )
+
+    assert not failed
+    assert (flow_dir / "step_0_cmd.txt").read_bytes() == "café\r\nx".encode("utf-8")
+    # Newlines are normalised exactly as a text-mode read would.
+    assert "\\r" not in (flow_dir / "step_1_cmd.txt").read_text(encoding="utf-8")
+    assert results[0][0] == (flow_dir / "step_1_cmd.txt").read_text(encoding="utf-8")
+
+
+def test_load_json_accepts_bytes_and_stdlib_extensions():
+    import math
+
+    assert orchestrator._load_json(b'["a", {"b": 1}]') == ["a", {"b": 1}]
+    assert math.isnan(orchestrator._load_json("[NaN]")[0])
+    assert orchestrator._load_json("[123456789012345678901234567890]") == [
+        123456789012345678901234567890
+    ]
+    assert orchestrator._load_json(b'{"n": -9999999999999999999}') == {
+        "n": -9999999999999999999
+    }
+
+
+def test_branch_inputs_are_parsed_once_per_output():
+    data = '["a", {"b": 1}, 2]'
+
+    first = orchestrator._branch_inputs(data)
+
+    assert first == ("a", '{"b": 1}', "2")
+    assert orchestrator._branch_inputs(data) is first
+    with pytest.raises(ValueError):
+        orchestrator._branch_inputs('{"not": "an array"}')
+
+
+def test_branch_inputs_keep_wide_integers_exact():
+    data = b'[12345678901234567890123, {"n": -9999999999999999999}]'
+
+    assert orchestrator._branch_inputs(data) == (
+        "12345678901234567890123",
+        '{"n": -9999999999999999999}',
+    )
+
+def test_large_branch_outputs_are_not_cached():
+    data = json.dumps(["x" * orchestrator._BRANCH_CACHE_MAX_LEN])
+
+    first = orchestrator._branch_inputs(data)
+
+    assert first == ("x" * orchestrator._BRANCH_CACHE_MAX_LEN,)
+    assert orchestrator._branch_inputs(data) is not first
+
+
+def test_plain_commands_skip_the_shell(tmp_path, monkeypatch):
+    calls = []
+    real_popen = orchestrator.subprocess.Popen
+
+    def recording_popen(args, **kwargs):
+        calls.append((args, kwargs.get("shell", False)))
+        return real_popen(args, **kwargs)
+
+    monkeypatch.setattr(orchestrator.subprocess, "Popen", recording_popen)
+    config = [
+        {"type": "cmd", "cmd": "basename /tmp/hello"},
+        {"type": "cmd", "cmd": "tr a-z A-Z | cat"},
+    ]
+
+    results, failed = orchestrator._run_flow(
+        config, [0, 0], threading.Lock(), tmp_path, tmp_path
+    )
+
+    assert not failed
+    assert results[0][0] == "HELLO\n"
+    (plain_args, plain_shell), (piped_args, piped_shell) = calls
+    assert not plain_shell and plain_args[1:] == ("/tmp/hello",)
+    assert piped_shell and piped_args == "tr a-z A-Z | cat"
+
+
+def test_plain_commands_split_only_on_spaces_and_tabs():
+    argv = orchestrator._cmd_argv("basename \t a\x0cb  c\xa0d")
+
+    assert argv is not None
+    assert argv[1:] == ("a\x0cb", "c\xa0d")
+
+def test_shell_builtins_keep_shell_semantics(tmp_path):
+    expected = subprocess.run(
+        "echo -e hi", shell=True, capture_output=True, text=True, check=True
+    ).stdout
+
+    results, failed = orchestrator._run_flow(
+        [{"type": "cmd", "cmd": "echo -e hi"}],
+        [0],
+        threading.Lock(),
+        tmp_path,
+        tmp_path,
+    )
+
+    assert not failed
+    assert results[0][0] == expected
+    for name in ("echo", "printf", "test", "[", "pwd", "kill", "true", "false"):
+        assert orchestrator._cmd_argv(f"{name} x") is None
+
+
+def test_long_linear_flow_runs_without_recursion(tmp_path):
+    import sys
+
+    steps = 60
+    config = [{"type": "cmd", "cmd": "printf x"}] + [
+        {"type": "cmd", "cmd": "cat"} for _ in range(steps - 1)
+    ]
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        results, failed = orchestrator._run_flow(
+            config, [0] * steps, threading.Lock(), tmp_path, tmp_path
+        )
+    finally:
+        sys.setrecursionlimit(limit)
+
+    assert not failed
+    assert results[0][0] == "x"
+
+
+def test_large_output_is_piped_to_next_cmd(tmp_path):
+    payload = "x" * (1 << 18)
+    source = tmp_path / "payload.txt"
+    source.write_text(payload, encoding="utf-8")
+    config = [
+        {"type": "cmd", "cmd": f"cat {source}"},
+        {"type": "cmd", "cmd": "cat"},
+    ]
+
+    results, failed = orchestrator._run_flow(
+        config, [0, 0], threading.Lock(), tmp_path, tmp_path
+    )
+
+    assert not failed
+    assert results[0][0] == payload
+
+
+@pytest.mark.skipif(not Path("/proc/self/fd").exists(), reason="needs /proc")
+def test_cmd_reads_previous_cmd_output_file_as_stdin(tmp_path):
+    config = [
+        {"type": "cmd", "cmd": "printf hello"},
+        {"type": "cmd", "cmd": "readlink /proc/self/fd/0"},
+    ]
+
+    results, failed = orchestrator._run_flow(
+        config, [0, 0], threading.Lock(), tmp_path, tmp_path
+    )
+
+    assert not failed
+    assert results[0][0].strip() == str(tmp_path / "step_0_cmd.txt")
+
+
+def test_plain_cmd_failure_names_configured_command(tmp_path):
+    results, failed = orchestrator._run_flow(
+        [{"type": "cmd", "cmd": "ls /nonexistent-orchestrator-path"}],
+        [0],
+        threading.Lock(),
+        tmp_path,
+        tmp_path,
+    )
+
+    assert failed
+    content = results[0][1].read_text(encoding="utf-8")
+    assert content.startswith(
+        "CalledProcessError: Command 'ls /nonexistent-orchestrator-path'"
+    )
@@ -27,10 +27,12 @@ def _copy_flow(base_config):
     return [dict(step) for step in base_config]
 
 
-def test_orchestrate_stops_after_max_failures(tmp_path, capsys):
+def test_orchestrate_stops_after_max_failures(tmp_path, capsys, monkeypatch):
     base_config = [{"type": "cmd", "cmd": "false"}]
     flow_configs = [_copy_flow(base_config) for _ in range(4)]
 
+    monkeypatch.setattr(orchestrator, "GENERATED_DIR", tmp_path)
+
     with pytest.raises(orchestrator.MaxFlowFailuresExceeded):
         orchestrator.orchestrate(
             base_config,
@@ -89,6 +91,11 @@ def test_orchestrate_groups_flows_in_run_directory(tmp_path, monkeypatch):
     for flow_dir in flow_dirs:
         assert flow_dir.name.startswith("flow_")
 
+    assert results.outputs == ["hi", "hi"]
+    assert results.paths == [None, None]
+    assert set(results.dirs) == flow_dirs
+    assert list(results) == list(zip(results.outputs, results.paths, results.dirs))
+
 
 def test_orchestrate_honors_max_flows(tmp_path, monkeypatch):
     base_config = [{"type": "cmd", "cmd": "printf hi"}]
@@ -170,6 +177,9 @@ def test_cmd_failure_writes_stderr_file(tmp_path):
     content = stderr_file.read_text(encoding="utf-8")
     assert "exit_code: 3" in content
     assert "boom" in content
+    error_content = error_file.read_text(encoding="utf-8")
+    assert error_content.startswith(f"CalledProcessError: Command '{cmd}'")
+    assert "Traceback" not in error_content
 
 
 def test_flow_exits_on_empty_response(tmp_path, capsys):
@@ -250,7 +260,9 @@ def test_flow_exits_on_response_signal(tmp_path, capsys):
 
 
 def test_codex_failure_writes_stderr_file(tmp_path, monkeypatch):
-    def fake_run_codex_cli(prompt, workdir, output_dir, max_retries=3, timeout=None):
+    def fake_run_codex_cli(
+        prompt, workdir, output_dir, max_retries=3, timeout=None, keep_artifacts=True
+    ):
         err = subprocess.CalledProcessError(2, ["codex", "exec"], stderr="codex boom\n")
         raise Exception("codex boom") from err
 
@@ -399,16 +411,7 @@ def test_finished_file_is_cleared_between_runs(tmp_path, monkeypatch):
     flow_configs = [_copy_flow(base_config)]
 
     run_dir = tmp_path / "run_shared"
-    first_flow_dir = run_dir / "flow_first"
-    second_flow_dir = run_dir / "flow_second"
-    mkdtemp_paths = iter(
-        [
-            str(run_dir),
-            str(first_flow_dir),
-            str(run_dir),
-            str(second_flow_dir),
-        ]
-    )
+    mkdtemp_paths = iter([str(run_dir), str(run_dir)])
 
     def fake_mkdtemp(prefix="", dir=None):
         path = Path(next(mkdtemp_paths))
@@ -438,6 +441,10 @@ def test_finished_file_is_cleared_between_runs(tmp_path, monkeypatch):
     )
 
     assert finished_file.read_text(encoding="utf-8").splitlines() == ["done"]
+    assert sorted(p.name for p in run_dir.glob("flow_*")) == [
+        "flow_000000",
+        "flow_000001",
+    ]
 
 
 def test_cancelled_branch_flow_is_marked_failed(tmp_path, monkeypatch):
@@ -532,3 +539,65 @@ def test_cli_ignore_max_failures_flag(tmp_path):
     assert "boom" in result.stderr
     assert "errors" in result.stdout
     assert "Maximum flow failures reached" not in result.stdout
+
+
+def test_array_parse_error_is_recorded_without_traceback(tmp_path):
+    config = [{"type": "cmd", "cmd": "printf 'not json'", "array": True}]
+
+    results, failed = orchestrator._run_flow(
+        config, [0], threading.Lock(), tmp_path, tmp_path
+    )
+
+    assert failed
+    error_file = results[0][1]
+    assert error_file.name == "step_0_array.txt"
+    content = error_file.read_text(encoding="utf-8")
+    assert content.startswith("JSON error: ")
+    assert "Traceback" not in content
+    assert list(error_file.parent.iterdir()) == [error_file]
+
+
+def test_progress_line_lists_steps_and_total(tmp_path, monkeypatch, capsys):
+    base_config = [
+        {"type": "cmd", "name": "{odd}", "cmd": "printf hi"},
+        {"type": "cmd", "cmd": "cat"},
+    ]
+    monkeypatch.setattr(orchestrator, "GENERATED_DIR", tmp_path)
+
+    orchestrator.orchestrate(
+        base_config,
+        [_copy_flow(base_config)],
+        workdir=tmp_path,
+        print_flow_paths=False,
+    )
+
+    final_line = capsys.readouterr().out.replace("\r", "\n").splitlines()[-1]
+    assert final_line.strip() == "{odd}: 0 -> cmd: 0 | 1/1"
+
+
+def test_resume_skips_flows_that_already_succeeded(tmp_path, monkeypatch):
+    from response_cache import ResponseCache
+
+    monkeypatch.setattr(orchestrator, "GENERATED_DIR", tmp_path)
+    counter = tmp_path / "runs.txt"
+    ok_flow = [{"type": "cmd", "cmd": f"echo x >> {shlex.quote(str(counter))}; printf ok"}]
+    bad_flow = [{"type": "cmd", "cmd": f"echo x >> {shlex.quote(str(counter))}; false"}]
+    cache_dir = tmp_path / "flow_cache"
+
+    def run():
+        return orchestrator.orchestrate(
+            ok_flow,
+            [_copy_flow(ok_flow), _copy_flow(bad_flow)],
+            workdir=tmp_path,
+            print_flow_paths=False,
+            halt_on_max_failures=False,
+            resume_cache=ResponseCache(cache_dir),
+        )
+
+    first = run()
+    second = run()
+
+    # Only the failed flow runs again.
+    assert counter.read_text().count("x") == 3
+    assert "ok" in second.outputs
+    assert second.dirs[second.outputs.index("ok")] == first.dirs[first.outputs.index("ok")]
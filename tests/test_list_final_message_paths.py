@@ -15,6 +15,7 @@ def test_orchestrate_lists_codex_final_message_paths(tmp_path, monkeypatch, caps
         output_dir: Path,
         timeout=None,
         max_retries: int = 3,
+        keep_artifacts: bool = True,
     ):
         exec_dir = output_dir / "codex_exec_test"
         exec_dir.mkdir(parents=True, exist_ok=True)
@@ -59,3 +60,44 @@ def test_orchestrate_skips_listing_when_final_step_not_codex(
 
     captured = capsys.readouterr()
     assert "final_message.txt" not in captured.out
+
+
+def test_max_codex_parallel_bounds_concurrent_codex_runs(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    base_config = [{"type": "codex"}]
+    flow_configs = [[dict(step) for step in base_config] for _ in range(6)]
+    monkeypatch.setattr(orchestrator, "GENERATED_DIR", tmp_path)
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def fake_run_codex_cli(
+        prompt, workdir, output_dir, timeout=None, max_retries=3, keep_artifacts=True
+    ):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+        final_path = output_dir / "final_message.txt"
+        final_path.write_text("ok", encoding="utf-8")
+        return "ok", final_path
+
+    monkeypatch.setattr(orchestrator, "run_codex_cli", fake_run_codex_cli)
+
+    results = orchestrator.orchestrate(
+        base_config,
+        flow_configs,
+        parallel=6,
+        workdir=tmp_path,
+        print_flow_paths=False,
+        max_codex_parallel=2,
+    )
+
+    assert len(results) == 6
+    assert peak == 2
@@ -0,0 +1,216 @@
+import asyncio
+import json
+
+import pytest
+
+import openai_utils
+
+
+class _DummyResponse:
+    def __init__(self, data: dict) -> None:
+        self._data = data
+
+    def model_dump(self) -> dict:
+        return self._data
+
+
+def _install_fake_async_client(monkeypatch, record):
+    class FakeResponses:
+        def __init__(self) -> None:
+            self.active = 0
+
+        async def create(self, **kwargs):  # type: ignore[no-untyped-def]
+            self.active += 1
+            record["max_active"] = max(record.get("max_active", 0), self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            record.setdefault("inputs", []).append(kwargs["input"])
+            if kwargs["input"] == "boom":
+                raise ValueError("bad prompt")
+            return _DummyResponse({"output": [{"content": [{"text": kwargs["input"]}]}]})
+
+    class FakeAsyncOpenAI:
+        def __init__(self, **kwargs) -> None:
+            self.responses = FakeResponses()
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            record["closed"] = True
+
+    monkeypatch.setattr(openai_utils, "AsyncOpenAI", FakeAsyncOpenAI)
+    monkeypatch.setattr(openai_utils, "_OPENAI_AVAILABLE", True)
+
+
+def test_call_openai_api_batch_limits_concurrency(monkeypatch):
+    record: dict = {}
+    _install_fake_async_client(monkeypatch, record)
+
+    prompts = [f"prompt {i}" for i in range(6)]
+    results = openai_utils.call_openai_api_batch(prompts, concurrency=2)
+
+    assert [r["output"][0]["content"][0]["text"] for r in results] == prompts
+    assert record["max_active"] <= 2
+    assert record["closed"] is True
+
+
+def test_call_openai_api_batch_returns_exceptions_in_place(monkeypatch):
+    record: dict = {}
+    _install_fake_async_client(monkeypatch, record)
+
+    results = openai_utils.call_openai_api_batch(["ok", "boom"], concurrency=2)
+
+    assert results[0]["output"][0]["content"][0]["text"] == "ok"
+    assert isinstance(results[1], ValueError)
+
+
+class _FakeBatchClient:
+    def __init__(self, statuses) -> None:
+        self.statuses = list(statuses)
+        self.uploaded = b""
+        self.files = self
+        self.batches = self
+        self.outputs = {}
+
+    # files API
+    def create(self, **kwargs):  # type: ignore[no-untyped-def]
+        if "purpose" in kwargs:
+            self.uploaded = kwargs["file"][1]
+            return type("Uploaded", (), {"id": "file-in"})()
+        self.batch_kwargs = kwargs
+        return type("Batch", (), {"id": "batch-1"})()
+
+    def content(self, file_id):  # type: ignore[no-untyped-def]
+        return type("Content", (), {"text": self.outputs[file_id]})()
+
+    # batches API
+    def retrieve(self, batch_id):  # type: ignore[no-untyped-def]
+        status = self.statuses.pop(0)
+        counts = type("Counts", (), {"total": 2})()
+        return type(
+            "Batch",
+            (),
+            {
+                "status": status,
+                "output_file_id": "file-out",
+                "error_file_id": "file-err",
+                "request_counts": counts,
+            },
+        )()
+
+
+def test_submit_and_wait_for_batch(monkeypatch):
+    fake = _FakeBatchClient(["in_progress", "completed"])
+    fake.outputs["file-out"] = json.dumps(
+        {
+            "custom_id": "1",
+            "response": {"status_code": 200, "body": {"output": "second"}},
+            "error": None,
+        }
+    )
+    fake.outputs["file-err"] = json.dumps(
+        {
+            "custom_id": "0",
+            "response": {"status_code": 400, "body": {"error": "bad"}},
+            "error": None,
+        }
+    )
+    monkeypatch.setattr(openai_utils, "client", fake)
+    sleeps = []
+    monkeypatch.setattr(openai_utils.time, "sleep", sleeps.append)
+
+    batch_id = openai_utils.submit_batch(["first", "second"], model="gpt-test")
+    assert batch_id == "batch-1"
+    assert fake.batch_kwargs["endpoint"] == "/v1/responses"
+    lines = [json.loads(line) for line in fake.uploaded.decode().splitlines()]
+    assert [line["custom_id"] for line in lines] == ["0", "1"]
+    assert lines[1]["body"] == {"model": "gpt-test", "input": "second"}
+
+    results = openai_utils.wait_for_batch(batch_id, poll_interval=0.01)
+
+    assert len(sleeps) == 1
+    assert isinstance(results[0], openai_utils.OpenAIBatchError)
+    assert results[1] == {"output": "second"}
+
+
+def test_wait_for_batch_raises_on_failed_job(monkeypatch):
+    fake = _FakeBatchClient(["failed"])
+    monkeypatch.setattr(openai_utils, "client", fake)
+
+    with pytest.raises(openai_utils.OpenAIBatchError):
+        openai_utils.wait_for_batch("batch-1")
+
+
+def test_call_openai_api_multi_packs_prompts_and_reissues_missing(monkeypatch):
+    calls = []
+
+    def fake_call(prompt, **kwargs):
+        calls.append(prompt)
+        if prompt.startswith(openai_utils._MULTI_PROMPT_INSTRUCTIONS):
+            lines = []
+            for line in prompt.split("\n\n", 1)[1].splitlines():
+                item = json.loads(line)
+                if item["prompt"] != "skip":
+                    lines.append(
+                        json.dumps({"id": item["id"], "output": item["prompt"].upper()})
+                    )
+            text = "\n".join(lines)
+        else:
+            text = f"single {prompt}"
+        return {"output": [{"content": [{"text": text}]}]}
+
+    monkeypatch.setattr(openai_utils, "call_openai_api", fake_call)
+
+    results = openai_utils.call_openai_api_multi(
+        ["a", "b", "skip", "c"], chunk_size=3, max_rounds=1
+    )
+
+    assert results == ["A", "B", "single skip", "C"]
+    assert len(calls) == 3
+
+
+def test_batchable_steps_share_one_batch_job(tmp_path, monkeypatch):
+    import orchestrator
+
+    batches = []
+
+    def fake_batch(prompts, *, web_search=False, use_batch_api=False, **kwargs):
+        batches.append((list(prompts), use_batch_api))
+        return [{"output": [{"content": [{"text": p.upper()}]}]} for p in prompts]
+
+    monkeypatch.setattr(orchestrator, "call_openai_api_batch", fake_batch)
+    monkeypatch.setattr(orchestrator, "GENERATED_DIR", tmp_path)
+
+    base_config = [{"type": "openai", "prompt": "p", "batchable": True}]
+    flow_configs = [
+        [{"type": "openai", "prompt": f"p{i}", "batchable": True}] for i in range(3)
+    ]
+
+    results = orchestrator.orchestrate(
+        base_config,
+        flow_configs,
+        parallel=3,
+        workdir=tmp_path,
+        print_flow_paths=False,
+        openai_batch_window=0.3,
+    )
+
+    assert len(batches) == 1
+    prompts, use_batch_api = batches[0]
+    assert use_batch_api
+    assert sorted(prompts) == ["p0", "p1", "p2"]
+    assert sorted(results.outputs) == ["P0", "P1", "P2"]
+
+
+def test_batcher_raises_per_prompt_errors(monkeypatch):
+    import orchestrator
+
+    def fake_batch(prompts, **kwargs):
+        return [RuntimeError("bad prompt")]
+
+    monkeypatch.setattr(orchestrator, "call_openai_api_batch", fake_batch)
+    batcher = orchestrator.OpenAIStepBatcher(window=0)
+
+    with pytest.raises(RuntimeError, match="bad prompt"):
+        batcher.call("x")
@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+
+import openai_utils
+
+
+class _FakeStream:
+    def __init__(self, events, fail_after=None):
+        self._events = events
+        self._fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __iter__(self):
+        for idx, event in enumerate(self._events):
+            if self._fail_after is not None and idx == self._fail_after:
+                raise openai_utils.requests.exceptions.RequestException("dropped")
+            yield event
+
+
+def _delta(text):
+    return SimpleNamespace(type="response.output_text.delta", delta=text)
+
+
+def _install_client(monkeypatch, streams):
+    calls = []
+
+    def stream(**kwargs):
+        calls.append(kwargs)
+        return streams.pop(0)
+
+    monkeypatch.setattr(
+        openai_utils, "client", SimpleNamespace(responses=SimpleNamespace(stream=stream))
+    )
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda _: None)
+    return calls
+
+
+def test_call_openai_api_stream_yields_deltas_and_retries_before_output(monkeypatch):
+    done = SimpleNamespace(type="response.completed")
+    calls = _install_client(
+        monkeypatch,
+        [
+            _FakeStream([_delta("never")], fail_after=0),
+            _FakeStream([_delta("Hel"), _delta("lo"), done]),
+        ],
+    )
+
+    chunks = list(openai_utils.call_openai_api_stream("Prompt"))
+
+    assert chunks == ["Hel", "lo"]
+    assert len(calls) == 2
+    assert calls[0]["input"] == "Prompt"
+
+
+def test_call_openai_api_stream_does_not_retry_after_output(monkeypatch):
+    calls = _install_client(
+        monkeypatch,
+        [_FakeStream([_delta("partial"), _delta("lost")], fail_after=1)],
+    )
+
+    stream = openai_utils.call_openai_api_stream("Prompt")
+    assert next(stream) == "partial"
+    with pytest.raises(openai_utils.requests.exceptions.RequestException):
+        next(stream)
+    assert len(calls) == 1
+
+
+def test_call_openai_api_stream_waits_on_rate_limiter_per_attempt(monkeypatch):
+    calls = _install_client(
+        monkeypatch,
+        [_FakeStream([_delta("never")], fail_after=0), _FakeStream([_delta("ok")])],
+    )
+    acquired = []
+
+    class _Limiter:
+        def acquire(self, tokens=0):
+            acquired.append(tokens)
+
+    chunks = list(
+        openai_utils.call_openai_api_stream("Prompt", rate_limiter=_Limiter())
+    )
+
+    assert chunks == ["ok"]
+    assert len(calls) == 2
+    assert acquired == [1, 1]
+
+
+def test_call_openai_api_stream_stops_retrying_after_deadline(monkeypatch):
+    calls = _install_client(
+        monkeypatch,
+        [_FakeStream([_delta("never")], fail_after=0), _FakeStream([_delta("ok")])],
+    )
+
+    with pytest.raises(openai_utils.requests.exceptions.RequestException):
+        list(openai_utils.call_openai_api_stream("Prompt", deadline=0))
+    assert len(calls) == 1
@@ -187,6 +187,32 @@ def test_openai_response_buckets_parsing(tmp_path, monkeypatch):
     assert followup_prompt == "Followup\nPrimary\nprint('ok')"
 
 
+def test_openai_response_buckets_keep_wide_integers_exact(tmp_path, monkeypatch):
+    def fake_api(prompt: str, *, web_search: bool = False, **kwargs) -> dict:
+        text = '{"summary": "Primary", "id": 12345678901234567890123}'
+        return {"output": [{"content": [{"text": text}]}]}
+
+    monkeypatch.setattr(orchestrator, "call_openai_api", fake_api)
+
+    res, failed = orchestrator._run_flow(
+        [
+            {
+                "type": "openai",
+                "prompt": "Describe",
+                "response_buckets": ["summary", "id"],
+                "primary_bucket": "summary",
+            }
+        ],
+        [0],
+        threading.Lock(),
+        tmp_path,
+        tmp_path,
+    )
+
+    assert not failed
+    bucket_file = tmp_path / "step_0_openai_bucket_id.txt"
+    assert bucket_file.read_text(encoding="utf-8") == "12345678901234567890123"
+
 def test_openai_response_buckets_fallback(tmp_path, monkeypatch):
     def fake_api(
         prompt: str,
@@ -224,6 +250,27 @@ def test_openai_response_buckets_fallback(tmp_path, monkeypatch):
     assert not bucket_path.exists()
 
 
+def test_openai_response_json_can_be_skipped(tmp_path, monkeypatch):
+    def fake_api(prompt: str, *, web_search: bool = False, **kwargs) -> dict:
+        return {"output": [{"content": [{"text": "Answer"}]}]}
+
+    monkeypatch.setattr(orchestrator, "call_openai_api", fake_api)
+
+    res, failed = orchestrator._run_flow(
+        [{"type": "openai", "prompt": "Ask"}],
+        [0],
+        threading.Lock(),
+        tmp_path,
+        tmp_path,
+        save_openai_responses=False,
+    )
+
+    assert not failed
+    assert res[0][0] == "Answer"
+    assert (tmp_path / "step_0_openai.txt").read_text(encoding="utf-8") == "Answer"
+    assert not (tmp_path / "step_0_openai_response.json").exists()
+
+
 class _DummyResponse:
     def __init__(self, data: dict) -> None:
         self._data = data
@@ -270,3 +317,18 @@ def test_call_openai_api_uses_preview_tool_without_type(monkeypatch):
 
     tools = dummy_responses.last_kwargs.get("tools")
     assert tools == [{"type": "web_search_preview"}]
+
+
+def test_call_openai_api_raw_skips_model_dump(monkeypatch):
+    class _NoDumpResponse:
+        output_text = "hi"
+
+        def model_dump(self):  # pragma: no cover - must not be called
+            raise AssertionError("model_dump should not be called")
+
+    responses = SimpleNamespace(create=lambda **kwargs: _NoDumpResponse())
+    monkeypatch.setattr(openai_utils, "client", SimpleNamespace(responses=responses))
+
+    response = openai_utils.call_openai_api("Prompt", raw=True)
+
+    assert openai_utils._response_text(response) == "hi"
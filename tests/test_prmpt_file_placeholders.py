@@ -1,6 +1,8 @@
 import threading
 from pathlib import Path
 
+import pytest
+
 import orchestrator
 
 
@@ -29,3 +31,142 @@ def test_prmpt_file_placeholders(tmp_path, monkeypatch):
     )
     assert not failed
     assert res[0][0] == "Hello World!"
+
+
+def test_prmpt_file_read_once_across_flows(tmp_path, monkeypatch):
+    template = tmp_path / "template.txt"
+    template.write_text("Hi {{{name}}}", encoding="utf-8")
+    names = []
+    for name in ("a", "b", "c"):
+        path = tmp_path / f"{name}.txt"
+        path.write_text(name, encoding="utf-8")
+        names.append(str(path))
+    names_file = tmp_path / "names.txt"
+    names_file.write_text("\n".join(names) + "\n", encoding="utf-8")
+
+    reads = []
+    original = Path.read_text
+
+    def counting_read_text(self, *args, **kwargs):
+        reads.append(self)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "read_text", counting_read_text)
+
+    flows = orchestrator._generate_flow_configs(
+        [{"type": "openai", "prmpt_file": str(template)}], {"name": names_file}
+    )
+
+    assert [flow[0]["prompt"] for flow in flows] == ["Hi a", "Hi b", "Hi c"]
+    assert reads.count(template) == 1
+
+
+def test_stream_flow_configs_expands_lazily(tmp_path):
+    paths = []
+    for idx in range(3):
+        path = tmp_path / f"v{idx}.txt"
+        path.write_text(str(idx), encoding="utf-8")
+        paths.append(str(path))
+    keys = {}
+    for key in ("x", "y"):
+        key_file = tmp_path / f"{key}.txt"
+        key_file.write_text("\n".join(paths) + "\n", encoding="utf-8")
+        keys[key] = key_file
+
+    stream = orchestrator._stream_flow_configs(
+        [{"type": "openai", "prompt": "{{{x}}}-{{{y}}}"}], keys
+    )
+
+    assert len(stream) == 9
+    flows = iter(stream)
+    first = next(flows)
+    assert first[0]["prompt"] == "0-0"
+    assert first.interpolated_paths == (paths[0], paths[0])
+    assert [flow[0]["prompt"] for flow in stream][-1] == "2-2"
+
+
+def test_missing_static_prmpt_file_fails_before_streaming(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        orchestrator._stream_flow_configs(
+            [{"type": "openai", "prmpt_file": str(tmp_path / "missing.txt")}], {}
+        )
+
+def test_static_steps_are_shared_across_flows(tmp_path):
+    paths = []
+    for idx in range(2):
+        path = tmp_path / f"v{idx}.txt"
+        path.write_text(str(idx), encoding="utf-8")
+        paths.append(str(path))
+    key_file = tmp_path / "x.txt"
+    key_file.write_text("\n".join(paths) + "\n", encoding="utf-8")
+
+    config = [
+        {"type": "openai", "prompt": "Static"},
+        {"type": "openai", "prompt": "{{{x}}}"},
+    ]
+
+    flows = list(orchestrator._stream_flow_configs(config, {"x": key_file}))
+
+    assert flows[0][0] is flows[1][0]
+    assert flows[0][0] == {"type": "openai", "prompt": "Static"}
+    assert [flow[1]["prompt"] for flow in flows] == ["0", "1"]
+
+    generated = orchestrator._generate_flow_configs(config, {"x": key_file})
+    generated[0][0]["prompt"] = "Edited"
+
+    assert generated[1][0] == {"type": "openai", "prompt": "Static"}
+    assert generated[0].interpolated_paths == flows[0].interpolated_paths
+
+
+def test_empty_key_list_is_rejected_before_reading_files(tmp_path, monkeypatch):
+    listed = tmp_path / "a.txt"
+    listed.write_text("A", encoding="utf-8")
+    full_list = tmp_path / "full.txt"
+    full_list.write_text(f"{listed}\n", encoding="utf-8")
+    empty_list = tmp_path / "empty.txt"
+    empty_list.write_text("\n  \n", encoding="utf-8")
+
+    reads = []
+    monkeypatch.setattr(orchestrator, "_read_text", lambda p: reads.append(p) or "")
+
+    with pytest.raises(ValueError, match="empty"):
+        orchestrator._stream_flow_configs(
+            [{"type": "cmd", "cmd": "echo {{{a}}} {{{b}}}"}],
+            {"a": full_list, "b": empty_list},
+        )
+    assert reads == []
+
+
+def test_shards_partition_the_flows(tmp_path):
+    paths = []
+    for idx in range(3):
+        path = tmp_path / f"v{idx}.txt"
+        path.write_text(str(idx), encoding="utf-8")
+        paths.append(str(path))
+    keys = {}
+    for key in ("x", "y"):
+        key_file = tmp_path / f"{key}.txt"
+        key_file.write_text("\n".join(paths) + "\n", encoding="utf-8")
+        keys[key] = key_file
+    base_config = [{"type": "openai", "prompt": "{{{x}}}-{{{y}}}"}]
+
+    everything = [
+        flow[0]["prompt"] for flow in orchestrator._stream_flow_configs(base_config, keys)
+    ]
+    shards = [
+        orchestrator._stream_flow_configs(base_config, keys, shard=(i, 4))
+        for i in range(4)
+    ]
+
+    assert [len(shard) for shard in shards] == [3, 2, 2, 2]
+    prompts = [[flow[0]["prompt"] for flow in shard] for shard in shards]
+    for i, shard_prompts in enumerate(prompts):
+        assert shard_prompts == everything[i::4]
+    assert sorted(p for shard in prompts for p in shard) == sorted(everything)
+
+
+def test_parse_shard_validates_range():
+    assert orchestrator._parse_shard("2/5") == (2, 5)
+    for bad in ("5/5", "-1/3", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            orchestrator._parse_shard(bad)
@@ -0,0 +1,202 @@
+import threading
+
+import orchestrator
+from response_cache import ResponseCache
+
+
+def _fake_api(calls):
+    def fake_api(prompt, *, web_search=False, **kwargs):
+        calls.append(prompt)
+        return {"output": [{"content": [{"text": f"answer {len(calls)}"}]}]}
+
+    return fake_api
+
+
+def test_key_depends_on_every_request_option():
+    base = ResponseCache.key("openai", "p", web_search=False, model="m")
+
+    assert base == ResponseCache.key("openai", "p", model="m", web_search=False)
+    assert base != ResponseCache.key("openai", "p", web_search=True, model="m")
+    assert base != ResponseCache.key("openai", "p", web_search=False, model="n")
+    assert base != ResponseCache.key("openai", "q", web_search=False, model="m")
+    assert base != ResponseCache.key("codex", "p", web_search=False, model="m")
+
+
+def test_cached_response_is_reused_across_flows(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(orchestrator, "call_openai_api", _fake_api(calls))
+    cache = ResponseCache()
+    config = [{"type": "openai", "prompt": "Same"}]
+
+    outputs = []
+    for name in ("a", "b"):
+        flow_dir = tmp_path / name
+        flow_dir.mkdir()
+        results, failed = orchestrator._run_flow(
+            config,
+            [0],
+            threading.Lock(),
+            tmp_path,
+            flow_dir,
+            response_cache=cache,
+        )
+        assert not failed
+        outputs.append(results[0][0])
+        assert (flow_dir / "step_0_openai_response.json").exists()
+
+    assert calls == ["Same"]
+    assert outputs == ["answer 1", "answer 1"]
+
+
+def test_cache_persists_to_disk(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(orchestrator, "call_openai_api", _fake_api(calls))
+    cache_dir = tmp_path / "cache"
+    config = [{"type": "openai", "prompt": "Persist"}]
+
+    for name in ("first", "second"):
+        flow_dir = tmp_path / name
+        flow_dir.mkdir()
+        # A new cache object per run, as separate invocations would have.
+        orchestrator._run_flow(
+            config,
+            [0],
+            threading.Lock(),
+            tmp_path,
+            flow_dir,
+            response_cache=ResponseCache(cache_dir),
+        )
+
+    assert calls == ["Persist"]
+    assert len(list(cache_dir.glob("*.json"))) == 1
+
+
+def test_step_can_opt_out_of_cache(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(orchestrator, "call_openai_api", _fake_api(calls))
+    cache = ResponseCache()
+    config = [{"type": "openai", "prompt": "Fresh", "cache": False}]
+
+    for name in ("a", "b"):
+        flow_dir = tmp_path / name
+        flow_dir.mkdir()
+        orchestrator._run_flow(
+            config,
+            [0],
+            threading.Lock(),
+            tmp_path,
+            flow_dir,
+            response_cache=cache,
+        )
+
+    assert calls == ["Fresh", "Fresh"]
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResponseCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"value": 1}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(4)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == [{"value": 1}] * 4
+
+
+def test_failed_computation_is_not_shared():
+    cache = ResponseCache()
+
+    def boom():
+        raise RuntimeError("boom")
+
+    try:
+        cache.get_or_compute("k", boom)
+    except RuntimeError:
+        pass
+    assert cache.get_or_compute("k", lambda: {"value": 2}) == {"value": 2}
+
+
+def test_cached_codex_step_writes_final_message(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_codex(
+        prompt, workdir, output_dir, timeout=None, max_retries=3, keep_artifacts=True
+    ):
+        calls.append(prompt)
+        exec_dir = output_dir / "codex_exec_live"
+        exec_dir.mkdir()
+        final_path = exec_dir / "final_message.txt"
+        final_path.write_text("done", encoding="utf-8")
+        return "done", final_path
+
+    monkeypatch.setattr(orchestrator, "run_codex_cli", fake_codex)
+    cache = ResponseCache()
+    config = [{"type": "codex", "prompt": "Fix it"}]
+
+    paths = []
+    for name in ("a", "b"):
+        flow_dir = tmp_path / name
+        flow_dir.mkdir()
+        results, failed = orchestrator._run_flow(
+            config,
+            [0],
+            threading.Lock(),
+            tmp_path,
+            flow_dir,
+            response_cache=cache,
+        )
+        assert not failed
+        paths.append(results[0][1])
+
+    assert calls == ["Fix it"]
+    assert paths[0].parent.name == "codex_exec_live"
+    assert paths[1].name == "final_message.txt"
+    assert paths[1].parent.parent == tmp_path / "b"
+    assert paths[1].read_text(encoding="utf-8") == "done"
+
+
+def test_memory_entries_are_bounded_lru():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_evicted_entries_are_reloaded_from_disk(tmp_path):
+    cache = ResponseCache(tmp_path, max_entries=1)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+
+    assert cache.get("a") == {"v": 1}
+
+
+def test_disk_entries_fall_back_to_stdlib_json(tmp_path):
+    cache = ResponseCache(tmp_path)
+    (tmp_path / "wide.json").write_text(
+        '{"n": 123456789012345678901234567890}', encoding="utf-8"
+    )
+
+    assert cache.get("wide") == {"n": 123456789012345678901234567890}
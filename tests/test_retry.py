@@ -0,0 +1,164 @@
+import pytest
+
+import openai_utils
+
+
+def test_retry_uses_exponential_backoff(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(openai_utils.time, "sleep", sleeps.append)
+    monkeypatch.setattr(openai_utils.random, "uniform", lambda a, b: 0.0)
+
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 4:
+            raise TimeoutError("retry me")
+        return "ok"
+
+    result = openai_utils._retry(
+        flaky, TimeoutError, max_retries=4, backoff_factor=0.5, max_backoff=1.5
+    )
+
+    assert result == "ok"
+    assert sleeps == [0.5, 1.0, 1.5]
+
+
+def test_retry_reraises_after_last_attempt(monkeypatch):
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda _: None)
+
+    def always_fails():
+        raise TimeoutError("still failing")
+
+    with pytest.raises(TimeoutError):
+        openai_utils._retry(always_fails, TimeoutError, max_retries=2)
+
+
+def test_retry_does_not_retry_unlisted_exceptions(monkeypatch):
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda _: None)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise KeyError("fatal")
+
+    with pytest.raises(KeyError):
+        openai_utils._retry(broken, TimeoutError, max_retries=3)
+
+    assert len(attempts) == 1
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def _patch_status_error(monkeypatch):
+    monkeypatch.setattr(openai_utils, "_OPENAI_AVAILABLE", True)
+    monkeypatch.setattr(openai_utils, "APIStatusError", _StatusError)
+
+
+@pytest.mark.parametrize(
+    "status, retryable", [(400, False), (404, False), (429, True), (503, True)]
+)
+def test_is_retryable_api_error_by_status(monkeypatch, status, retryable):
+    _patch_status_error(monkeypatch)
+
+    assert openai_utils._is_retryable_api_error(_StatusError(status)) is retryable
+    assert openai_utils._is_retryable_api_error(TimeoutError()) is True
+
+
+def test_retry_fails_fast_on_client_error_and_honours_retry_after(monkeypatch):
+    _patch_status_error(monkeypatch)
+    sleeps = []
+    monkeypatch.setattr(openai_utils.time, "sleep", sleeps.append)
+    monkeypatch.setattr(openai_utils.random, "uniform", lambda a, b: 0.0)
+
+    def bad_request():
+        raise _StatusError(400)
+
+    with pytest.raises(_StatusError):
+        openai_utils._retry(
+            bad_request,
+            _StatusError,
+            retry_if=openai_utils._is_retryable_api_error,
+        )
+    assert sleeps == []
+
+    errors = [_StatusError(429, {"retry-after": "3"})]
+
+    def rate_limited():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    result = openai_utils._retry(
+        rate_limited,
+        _StatusError,
+        retry_if=openai_utils._is_retryable_api_error,
+        retry_after=openai_utils._retry_after_seconds,
+    )
+
+    assert result == "ok"
+    assert sleeps == [3.0]
+
+
+def test_retry_stops_at_deadline(monkeypatch):
+    clock = [0.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(openai_utils.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(openai_utils.time, "sleep", fake_sleep)
+    monkeypatch.setattr(openai_utils.random, "uniform", lambda a, b: 0.0)
+    attempts = []
+
+    def slow_failure():
+        attempts.append(1)
+        clock[0] += 2.0
+        raise TimeoutError("slow")
+
+    with pytest.raises(TimeoutError):
+        openai_utils._retry(
+            slow_failure,
+            TimeoutError,
+            max_retries=10,
+            backoff_factor=1.0,
+            max_backoff=8.0,
+            deadline=5.0,
+        )
+
+    assert len(attempts) == 2
+    assert sleeps == [1.0]
+
+
+def test_rate_limiter_waits_for_bucket_refill(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(openai_utils.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(openai_utils.time, "sleep", fake_sleep)
+
+    limiter = openai_utils.RateLimiter(rpm=2, tpm=600)
+    limiter.acquire(100)
+    limiter.acquire(100)
+    assert sleeps == []
+
+    # Third request exceeds the request bucket: one request refills in 30s.
+    limiter.acquire(100)
+    assert sleeps == [pytest.approx(30.0)]
+
+    # Token budget: 600 tokens/minute refills at 10 tokens per second.
+    token_limiter = openai_utils.RateLimiter(tpm=600)
+    token_limiter.acquire(600)
+    token_limiter.acquire(500)
+    assert sleeps[-1] == pytest.approx(50.0)
@@ -1,23 +1,28 @@
-import io
+import os
+import subprocess
+import sys
+
+import pytest
 
 import openai_utils
+import orchestrator
 
 
 def test_run_codex_cli_falls_back_to_stdout(tmp_path, monkeypatch):
     prompts = []
 
-    def fake_popen(cmd, stdout, stderr, text):
+    def fake_popen(cmd, stdout, stderr, text, **kwargs):
         prompts.append(cmd[-1])
+        stdout.write("final output\n")
+        stdout.flush()
 
         class DummyProcess:
             def __init__(self) -> None:
                 self.args = cmd
                 self.returncode = 0
-                self.stdout = io.StringIO("final output\n")
-                self.stderr = io.StringIO("")
 
-            def wait(self, timeout=None):
-                return 0
+            def communicate(self, timeout=None):
+                return None, ""
 
             def kill(self):
                 return None
@@ -43,3 +48,114 @@ def test_run_codex_cli_falls_back_to_stdout(tmp_path, monkeypatch):
     assert len(time_contents) >= 2
     assert time_contents[0] == "0"
     assert float(time_contents[1]) >= 0
+
+
+def _install_fake_codex(tmp_path, monkeypatch, body: str) -> None:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "codex"
+    script.write_text(f"#!{sys.executable}\n{body}", encoding="utf-8")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}")
+
+
+def test_run_codex_cli_streams_stdout_and_reports_stderr(tmp_path, monkeypatch):
+    _install_fake_codex(
+        tmp_path,
+        monkeypatch,
+        "import sys\nprint('progress')\nsys.stderr.write('codex failed\\n')\nsys.exit(4)\n",
+    )
+
+    with pytest.raises(Exception, match="codex failed") as excinfo:
+        openai_utils.run_codex_cli("Prompt", tmp_path, tmp_path)
+
+    assert isinstance(excinfo.value.__cause__, subprocess.CalledProcessError)
+    assert excinfo.value.__cause__.returncode == 4
+    exec_dir = next(tmp_path.glob("codex_exec_*"))
+    assert (exec_dir / "stdout.txt").read_text(encoding="utf-8") == "progress\n"
+
+
+def test_run_codex_cli_times_out_after_retries(tmp_path, monkeypatch):
+    _install_fake_codex(tmp_path, monkeypatch, "import time\ntime.sleep(5)\n")
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda _: None)
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        openai_utils.run_codex_cli(
+            "Prompt", tmp_path, tmp_path, max_retries=2, timeout=0.2
+        )
+
+
+def test_run_codex_cli_discards_scratch_without_keep_artifacts(tmp_path, monkeypatch):
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    monkeypatch.setenv("CODEX_SCRATCH", str(scratch))
+    _install_fake_codex(
+        tmp_path,
+        monkeypatch,
+        "import sys\nprint('noise')\n"
+        "path = sys.argv[sys.argv.index('--output-last-message') + 1]\n"
+        "open(path, 'w').write('done')\n",
+    )
+
+    message, path = openai_utils.run_codex_cli(
+        "Prompt", tmp_path, output_dir, keep_artifacts=False
+    )
+
+    assert message == "done"
+    assert path.parent.parent == output_dir
+    assert sorted(p.name for p in path.parent.iterdir()) == ["final_message.txt"]
+    assert list(scratch.iterdir()) == []
+
+
+def test_orchestrate_codex_scratch_keeps_only_final_message(tmp_path, monkeypatch):
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setenv("CODEX_SCRATCH", str(scratch))
+    monkeypatch.setattr(orchestrator, "GENERATED_DIR", tmp_path / "generated")
+    _install_fake_codex(
+        tmp_path,
+        monkeypatch,
+        "import sys\nprint('noise')\n"
+        "path = sys.argv[sys.argv.index('--output-last-message') + 1]\n"
+        "open(path, 'w').write('done')\n",
+    )
+    config = [{"type": "codex", "prompt": "Prompt"}]
+
+    results = orchestrator.orchestrate(
+        config,
+        [config],
+        workdir=tmp_path,
+        print_flow_paths=False,
+        keep_codex_artifacts=False,
+    )
+
+    (message, path, _), = results
+    assert message == "done"
+    assert sorted(p.name for p in path.parent.iterdir()) == ["final_message.txt"]
+    assert list(scratch.iterdir()) == []
+
+def test_run_codex_cli_reuses_exec_dir_across_retries(tmp_path, monkeypatch):
+    attempts = tmp_path / "attempts"
+    _install_fake_codex(
+        tmp_path,
+        monkeypatch,
+        "import pathlib, sys, time\n"
+        f"counter = pathlib.Path({str(attempts)!r})\n"
+        "n = int(counter.read_text()) if counter.exists() else 0\n"
+        "counter.write_text(str(n + 1))\n"
+        "print(f'attempt {n}')\n"
+        "sys.stdout.flush()\n"
+        "if n == 0:\n"
+        "    time.sleep(5)\n",
+    )
+    monkeypatch.setattr(openai_utils.time, "sleep", lambda _: None)
+
+    message, path = openai_utils.run_codex_cli(
+        "Prompt", tmp_path, tmp_path, max_retries=2, timeout=0.5
+    )
+
+    assert message == "attempt 1\n"
+    assert len(list(tmp_path.glob("codex_exec_*"))) == 1
+    assert (path.parent / "stdout.txt").read_text(encoding="utf-8") == "attempt 1\n"
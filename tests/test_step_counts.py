@@ -0,0 +1,49 @@
+import threading
+
+import orchestrator
+
+
+def test_step_counts_sums_per_thread_shards():
+    counts = orchestrator.StepCounts(2)
+    entered = threading.Barrier(5)
+    release = threading.Event()
+    moved = threading.Barrier(5)
+    finish = threading.Event()
+
+    def worker():
+        counts.add(0, 1)
+        entered.wait()
+        release.wait()
+        counts.add(0, -1)
+        counts.add(1, 1)
+        moved.wait()
+        finish.wait()
+        counts.add(1, -1)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    entered.wait()
+    assert counts.snapshot() == [4, 0]
+
+    release.set()
+    moved.wait()
+    assert counts.snapshot() == [0, 4]
+
+    finish.set()
+    for t in threads:
+        t.join()
+    assert counts.snapshot() == [0, 0]
+
+
+def test_run_flow_accepts_step_counts(tmp_path):
+    counts = orchestrator.StepCounts(1)
+    flow_dir = tmp_path / "flow"
+    flow_dir.mkdir()
+
+    res, failed = orchestrator._run_flow(
+        [{"type": "cmd", "cmd": "cat"}], counts, None, tmp_path, flow_dir
+    )
+
+    assert not failed
+    assert counts.snapshot() == [0]